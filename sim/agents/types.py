@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, Literal, List
+from json.encoder import encode_basestring_ascii
+from typing import Dict, Any, Optional, Literal, Mapping, Sequence
 
 
 Role = Literal["gatherer", "builder", "idle"]
@@ -16,9 +17,17 @@ class Observation:
     tile: Dict[str, int]        # {"food": int, "wood": int, "stone": int}
     inventory: Dict[str, int]   # {"food": int, "wood": int, "stone": int}
     structure: Optional[Dict[str, Any]]
-    structures: Optional[List[Dict[str, Any]]] = None
-    settlements: Optional[List[Dict[str, Any]]] = None  # P2.1
-    nearest_settlement: Optional[Dict[str, Any]] = None  # P2.1 – convenience
+    # structures / settlements / nearest_settlement are read-only views shared by
+    # every agent's observation within a tick
+    structures: Optional[Sequence[Mapping[str, Any]]] = None
+    settlements: Optional[Sequence[Mapping[str, Any]]] = None  # P2.1
+    nearest_settlement: Optional[Mapping[str, Any]] = None  # P2.1 – convenience
+    # set only with a local observation radius: structures/settlements above are
+    # then limited to that radius, and this counts the nearest settlement's buildings
+    nearest_counts: Optional[Mapping[str, int]] = None
+    # set when run with mask_builds: bit Building.X means building X near the
+    # nearest settlement would not be refused (see build_governors.legal_build_mask)
+    build_mask: Optional[int] = None
     role: Optional[Role] = None
 
 
@@ -43,3 +52,20 @@ class Action:
         if self.role_hint is not None:
             d["role_hint"] = self.role_hint
         return d
+
+    def to_json(self) -> str:
+        """`json.dumps(self.to_dict())`, without the dict."""
+        out = '{"type": ' + _json_str(self.type)
+        if self.type == "move":
+            out += f', "dx": {int(self.dx)!r}, "dy": {int(self.dy)!r}'
+        if self.type == "gather":
+            out += ', "resource": ' + _json_str(self.resource)
+        if self.type == "build":
+            out += ', "building": ' + _json_str(self.building)
+        if self.role_hint is not None:
+            out += ', "role_hint": ' + _json_str(self.role_hint)
+        return out + "}"
+
+
+def _json_str(v: Optional[str]) -> str:
+    return "null" if v is None else encode_basestring_ascii(v)
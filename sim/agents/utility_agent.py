@@ -7,6 +7,7 @@ import math
 
 from sim.agents.types import Observation, Action
 from sim.core.rng import RNG
+from sim.world.buildings import BUILDING_CODES
 
 
 DEFAULT_WEIGHTS: Dict[str, float] = {
@@ -34,6 +35,19 @@ def _settlement_stocks(obs) -> tuple:
     return float(nearest.get("wood_stock", 0) or 0), float(nearest.get("stone_stock", 0) or 0)
 
 
+def _types(obs, structs) -> set:
+    # local observations carry the nearest settlement's building counts
+    if obs.nearest_counts is not None:
+        return set(obs.nearest_counts)
+    return {st.get("type") for st in structs}
+
+
+def _farm_count(obs, structs) -> int:
+    if obs.nearest_counts is not None:
+        return int(obs.nearest_counts.get("farm", 0))
+    return sum(1 for st in structs if st.get("type") == "farm")
+
+
 def _can_afford(inv, need_w: int, need_s: int, obs) -> float:
     aw = float(inv.get("wood", 0))
     ast = float(inv.get("stone", 0))
@@ -50,6 +64,7 @@ class UtilityAgent:
     agent_id: str
     weights: Dict[str, float]
     governor_bias: Optional[Dict[str, float]] = None
+    mask_builds: bool = False  # skip build candidates the observation's build_mask rules out
 
     def act(self, obs: Observation, rng: RNG) -> Action:
         inv = obs.inventory
@@ -69,7 +84,7 @@ class UtilityAgent:
             if has_farm and not has_storage and inv.get("wood", 0) >= 3 and inv.get("stone", 0) >= 2:
                 return Action(type="build", building="storage")
 
-        types = {st.get("type") for st in structs}
+        types = _types(obs, structs)
         settlements = obs.settlements or ([obs.nearest_settlement] if obs.nearest_settlement else [])
         need_library = False
         for s in settlements:
@@ -128,10 +143,13 @@ class UtilityAgent:
             if obs.tile.get(r, 0) > 0:
                 c.append(Action(type="gather", resource=r))
         if obs.structure is None:
+            mask = obs.build_mask if self.mask_builds else None
             for b in ("farm", "storage", "hut", "granary", "mine", "road",
                       "workshop", "barracks", "market", "temple", "academy",
                       "walls", "irrigation", "library", "foundry", "hall", "command",
                       "lab", "observatory"):
+                if mask is not None and not mask >> BUILDING_CODES[b] & 1:
+                    continue
                 c.append(Action(type="build", building=b))
         for dx, dy in ((1, 0), (0, 1), (-1, 0), (0, -1)):
             c.append(Action(type="move", dx=dx, dy=dy))
@@ -177,10 +195,10 @@ class UtilityAgent:
 
         if a.type == "build":
             b = a.building or ""
-            types = {st.get("type") for st in structures}
+            types = _types(obs, structures)
             has_storage, has_farm = "storage" in types, "farm" in types
             has_granary, has_mine = "granary" in types, "mine" in types
-            farm_count = sum(1 for st in structures if st.get("type") == "farm")
+            farm_count = _farm_count(obs, structures)
             hunger = pressure * float(w["w_avoid_build_when_hungry"])
             nearest = obs.nearest_settlement or {}
             era = int(nearest.get("era", 2))
@@ -1,5 +1,8 @@
 import argparse
-from sim.core.simloop import run_sim
+from sim.core.simloop import resume_sim, run_sim
+from sim.log.logger import EVENT_FORMATS, EVENT_SETTINGS, LOG_LEVELS
+from sim.log.sinks import COMPRESSIONS
+from sim.world.settlements import SETTLEMENT_RULES, SettlementRules
 
 
 EXAMPLES = """
@@ -10,6 +13,10 @@ examples:
   python -m sim run --scenario "seed 42; start_food 6; event drought 120"
   python -m sim run --control A0 --control-policy gather_food
   python -m sim run --agents 6 --governor "focus expand" --scenario "seed 7; event boom 80"
+  python -m sim run --ticks 8000 --checkpoint-every 500
+  python -m sim run --resume runs/<run_id> --ticks 10000
+  python -m sim run --ticks 5000 --log-level key --log population_changed=on
+  python -m sim run --ticks 50000 --segment-ticks 1000 --compress gzip
 """
 
 
@@ -35,8 +42,8 @@ def main():
         help="Random seed (default: 123). Same seed = same outcome.",
     )
     runp.add_argument(
-        "--ticks", type=int, default=200,
-        help="How many ticks to simulate (default: 200)",
+        "--ticks", type=int, default=None,
+        help="How many ticks to simulate (default: 200; with --resume: the run's own length)",
     )
     runp.add_argument(
         "--snapshot-every", type=int, default=10,
@@ -68,18 +75,127 @@ def main():
              "build_farm, build_hut, build_storage, idle (default: idle)",
     )
 
+    runp.add_argument(
+        "--obs-radius", type=int, default=None, metavar="N",
+        help="Agents only see structures and settlements within N tiles "
+             "(default: the whole world)",
+    )
+
+    runp.add_argument(
+        "--mask-builds", action="store_true",
+        help="Utility agents skip build actions their settlement's gates would refuse",
+    )
+
+    # Long runs
+    runp.add_argument(
+        "--checkpoint-every", type=int, default=0, metavar="N",
+        help="Save the full simulation state to runs/<id>/checkpoint.bin every N ticks",
+    )
+    runp.add_argument(
+        "--resume", type=str, default=None, metavar="PATH",
+        help="Continue a run from its last checkpoint (run directory or checkpoint file); "
+             "other run options are taken from the checkpoint",
+    )
+
+    # Logging
+    runp.add_argument(
+        "--log-level", choices=LOG_LEVELS, default=None,
+        help="Which events to write: all (default), key (milestones and builds only) or off",
+    )
+    runp.add_argument(
+        "--log", action="append", default=[], metavar="TYPE=on|off",
+        help="Switch one event type on or off (repeatable). "
+             "Example: --log action_attempted=off --log action_resolved=builds",
+    )
+
+    runp.add_argument(
+        "--event-format", choices=EVENT_FORMATS, default="jsonl",
+        help="events.jsonl (default) or the compact events.bin (read it with sim.log.binlog)",
+    )
+    runp.add_argument(
+        "--segment-ticks", type=int, default=0, metavar="N",
+        help="Split the logs into files of N ticks each, listed in manifest.json (default: 0, one file)",
+    )
+    runp.add_argument(
+        "--compress", choices=tuple(COMPRESSIONS), default=None,
+        help="With --segment-ticks: compress closed segments in the background",
+    )
+    runp.add_argument(
+        "--async-log", action="store_true",
+        help="Serialize and write logs on a background thread",
+    )
+    runp.add_argument(
+        "--log-queue", type=int, default=64, metavar="N",
+        help="With --async-log: batches buffered before the simulation waits "
+             "for the writer (default: 64, 0 = unbounded)",
+    )
+
+    runp.add_argument(
+        "--flush-every", type=int, default=1000, metavar="N",
+        help="Flush the log files after N writes (default: 1000, 0 = never); "
+             "key events always flush",
+    )
+    runp.add_argument(
+        "--flush-ms", type=float, default=250.0, metavar="T",
+        help="Also flush when T milliseconds have passed since the last flush (default: 250, 0 = never)",
+    )
+
+    # Rules
+    runp.add_argument(
+        "--rule", action="append", default=[], metavar="NAME=VALUE",
+        help="Override one settlement rule for this run (repeatable). "
+             "Example: --rule raid_interval=40 --rule farm_yield_per_tick=1.8",
+    )
+
     args = p.parse_args()
 
     if args.cmd == "run":
+        overrides = {}
+        for item in args.rule:
+            name, sep, value = item.partition("=")
+            if not sep:
+                p.error(f"--rule expects NAME=VALUE, got {item!r}")
+            if name.strip() not in SETTLEMENT_RULES:
+                p.error(f"--rule: unknown settlement rule {name.strip()!r}")
+            try:
+                overrides[name.strip()] = SettlementRules.parse(name.strip(), value.strip())
+            except ValueError as e:
+                p.error(f"--rule {e}")
+        log_overrides = {}
+        for item in args.log:
+            etype, sep, setting = item.partition("=")
+            if not sep or setting.strip() not in EVENT_SETTINGS:
+                p.error(f"--log expects TYPE=on|off (or action_resolved=builds), got {item!r}")
+            if setting.strip() == "builds" and etype.strip() != "action_resolved":
+                p.error(f"--log {etype.strip()}: 'builds' only applies to action_resolved")
+            log_overrides[etype.strip()] = setting.strip()
+        if args.compress and args.segment_ticks <= 0:
+            p.error("--compress needs --segment-ticks")
+        if args.resume:
+            resume_sim(args.resume, ticks=args.ticks)
+            return
         run_sim(
             seed=args.seed,
-            ticks=args.ticks,
+            ticks=args.ticks if args.ticks is not None else 200,
             snapshot_every=args.snapshot_every,
             num_agents=args.agents,
             governor_command=args.governor,
             scenario_commands=args.scenario,
             control_agent_id=args.control,
             control_policy=args.control_policy,
+            settlement_rules=overrides or None,
+            obs_radius=args.obs_radius,
+            mask_builds=args.mask_builds,
+            checkpoint_every=args.checkpoint_every,
+            log_level=args.log_level,
+            log_overrides=log_overrides or None,
+            async_log=args.async_log,
+            log_queue_size=args.log_queue,
+            flush_every=args.flush_every,
+            flush_ms=args.flush_ms,
+            event_format=args.event_format,
+            segment_ticks=args.segment_ticks,
+            compression=args.compress,
         )
 
 
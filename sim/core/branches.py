@@ -0,0 +1,81 @@
+"""Run what-if branches of a live Simulation side by side.
+
+On platforms with os.fork every branch runs in a child process that
+inherits the parent's memory copy-on-write, so the shared prefix is never
+re-run or re-serialized; only each branch's RunResult is pickled back.
+Elsewhere, and whenever the process runs other threads (an async log
+writer, a log compressor), branches are cloned with `Simulation.fork()` and
+run in turn: forking a multi-threaded process can deadlock the child.
+"""
+import os
+import pickle
+import threading
+from typing import Any, Dict, List, Optional
+
+from sim.core.simloop import RunResult, Simulation
+from sim.log.run_id import make_run_id
+
+
+def _finish(sim: Simulation, return_state: bool) -> RunResult:
+    sim.run_until(sim.ticks)
+    score = sim.close()
+    return RunResult(sim.run_id, score, sim.summary, sim.state() if return_state else None)  # type: ignore[arg-type]
+
+
+def run_branches(sim: Simulation, branches: List[Dict[str, Any]], workers: Optional[int] = None,
+                 return_state: bool = False) -> List[RunResult]:
+    """Run each branch of `sim` from its current tick to the end.
+
+    `branches` holds `Simulation.fork()` keyword arguments, e.g.
+    [{"governor_command": "focus food"}, {"scenario_commands": "event drought 2100"}];
+    scenarios with setup commands raise ValueError before anything runs.
+    Results come back in branch order; `sim` itself is not advanced.
+    At most `workers` (default: CPU count) child processes run at once.
+    """
+    for br in branches:
+        Simulation._check_branch(**br)
+    # push out pending log writes so no child inherits half-written buffers
+    sim.logger.position()
+    if not hasattr(os, "fork") or threading.active_count() > 1:
+        return [_finish(sim.fork(**br), return_state) for br in branches]
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    # children share the parent's global random state, so pick run ids here
+    run_ids = [make_run_id() for _ in branches]
+    results: List[RunResult] = []
+    for start in range(0, len(branches), workers):
+        children = []
+        for i in range(start, min(start + workers, len(branches))):
+            r, w = os.pipe()
+            pid = os.fork()
+            if pid == 0:  # child
+                os.close(r)
+                # hold on to the parent's logger: dropping it would flush and
+                # close the run's log files from this process
+                parent_logger = sim.logger  # noqa: F841
+                try:
+                    sim._branch(**branches[i])
+                    sim.run_id = run_ids[i]
+                    payload, code = pickle.dumps(_finish(sim, return_state)), 0
+                except BaseException as e:
+                    try:
+                        payload = pickle.dumps(e)
+                    except Exception:
+                        payload = pickle.dumps(RuntimeError(repr(e)))
+                    code = 1
+                with os.fdopen(w, "wb") as f:
+                    f.write(payload)
+                os._exit(code)
+            os.close(w)
+            children.append((pid, r))
+        for pid, r in children:
+            with os.fdopen(r, "rb") as f:
+                data = f.read()
+            os.waitpid(pid, 0)
+            if not data:
+                raise RuntimeError(f"branch worker {pid} exited without a result")
+            out = pickle.loads(data)
+            if isinstance(out, BaseException):
+                raise out
+            results.append(out)
+    return results
@@ -1,9 +1,10 @@
 """Build governors for AI-world."""
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
 
-from sim.world.settlements import SettlementManager
+from sim.world.buildings import BUILDING_CODES, BUILDING_NAMES
 
 
 BUILD_ALIASES = {
@@ -42,457 +43,357 @@ def normalise_building_name(raw: Optional[str]) -> str:
     return BUILD_ALIASES.get(b, b)
 
 
-def _settlement_struct_counts(sid, sm, world):
-    farms = sm.count_structures_of_type(sid, "farm", world)
-    stor = sm.count_structures_of_type(sid, "storage", world)
-    gran = sm.count_structures_of_type(sid, "granary", world)
-    mine = sm.count_structures_of_type(sid, "mine", world)
-    road = sm.count_structures_of_type(sid, "road", world)
-    workshop = sm.count_structures_of_type(sid, "workshop", world)
-    barracks = sm.count_structures_of_type(sid, "barracks", world)
-    market = sm.count_structures_of_type(sid, "market", world)
-    temple = sm.count_structures_of_type(sid, "temple", world)
-    academy = sm.count_structures_of_type(sid, "academy", world)
-    walls = sm.count_structures_of_type(sid, "walls", world)
-    irrigation = sm.count_structures_of_type(sid, "irrigation", world)
-    library = sm.count_structures_of_type(sid, "library", world)
-    foundry = sm.count_structures_of_type(sid, "foundry", world)
-    hall = sm.count_structures_of_type(sid, "hall", world)
-    command = sm.count_structures_of_type(sid, "command", world)
-    lab = sm.count_structures_of_type(sid, "lab", world)
-    observatory = sm.count_structures_of_type(sid, "observatory", world)
-    total = (farms + stor + gran + mine + road + workshop + barracks +
-             market + temple + academy + walls + irrigation + library +
-             foundry + hall + command + lab + observatory +
-             sm.count_structures_of_type(sid, "hut", world))
-    return (farms, stor, gran, mine, road, workshop, barracks, market, temple,
-            academy, walls, irrigation, library, foundry, hall, command, lab, observatory, total)
+@dataclass(frozen=True)
+class Req:
+    """One prerequisite, checked against the nearest settlement or, with
+    scope="world", against every settlement.
+
+    kind "count": at least `n` of building `arg`;  "cap": fewer than `n` of `arg`;
+    "era": era >= `n` (world scope: some settlement there, holding subject `arg`
+    if given);  "subject": subject `arg` unlocked;  "total": at least `n`
+    structures;  "fed": not starving;  "any": one of the Reqs in `arg` holds;
+    "vacancy": some settlement at era `n` with subject `arg[1]` lacks building `arg[0]`.
+    """
+    kind: str
+    arg: Any = None
+    n: int = 1
+    scope: str = "settlement"
+
+
+@dataclass(frozen=True)
+class TechNode:
+    """How one building is redirected and gated.
+
+    `redirects` are (requirement, target, note), tried in order by
+    resolve_building: the first unmet requirement swaps the request for
+    `target`. `gates` are (requirement, note), checked in order by can_build:
+    the first unmet one refuses the build with `note`. A building with gates
+    also needs a settlement to exist, refused with `no_settlement` otherwise.
+    """
+    redirects: Tuple[Tuple[Req, str, str], ...] = ()
+    gates: Tuple[Tuple[Req, str], ...] = ()
+    no_settlement: str = ""
+
+
+def _has(b: str, n: int = 1, scope: str = "settlement") -> Req:
+    return Req("count", b, n, scope)
+
+
+def _cap(b: str, n: int = 1, scope: str = "settlement") -> Req:
+    return Req("cap", b, n, scope)
+
+
+_ERA3, _ERA4 = Req("era", n=3), Req("era", n=4)
+
+TECH_TREE: Dict[str, TechNode] = {
+    "farm": TechNode(redirects=(
+        (Req("any", (_cap("farm", FARM_SOFT_CAP), _cap("storage"))), "hut", "farm_capped_to_hut"),
+        (_cap("farm", FARM_SOFT_CAP), "storage", "farm_capped_to_storage"),
+    )),
+    "storage": TechNode(redirects=(
+        (_cap("storage"), "hut", "storage_capped_to_hut"),
+    )),
+    "hut": TechNode(gates=(
+        (_has("storage"), "hut_requires_storage"),
+        (Req("fed"), "hut_blocked_while_starving"),
+    ), no_settlement="hut_requires_storage"),
+    "granary": TechNode(redirects=(
+        (_cap("granary"), "hut", "granary_capped_to_hut"),
+        (_has("storage"), "storage", "granary_needs_storage"),
+        (_has("farm"), "farm", "granary_needs_farm"),
+    ), gates=(
+        (_has("storage"), "granary_needs_storage"),
+        (_has("farm"), "granary_needs_farm"),
+        (_cap("granary"), "granary_already_exists"),
+    )),
+    "mine": TechNode(redirects=(
+        (_cap("mine"), "hut", "mine_capped_to_hut"),
+        (_has("storage"), "storage", "mine_needs_storage"),
+        (_has("farm"), "farm", "mine_needs_farm"),
+    ), gates=(
+        (_has("storage"), "mine_needs_storage"),
+        (_has("farm"), "mine_needs_farm"),
+        (_cap("mine"), "mine_already_exists"),
+    )),
+    "road": TechNode(redirects=(
+        (Req("any", (_has("mine"), Req("total", n=4), _has("storage"))), "storage", "road_needs_base"),
+        (Req("any", (_has("mine"), Req("total", n=4))), "farm", "road_needs_base"),
+    ), gates=(
+        (Req("any", (_has("mine"), Req("total", n=4))), "road_needs_mine_or_growth"),
+    )),
+    "workshop": TechNode(redirects=(
+        (_cap("workshop"), "hut", "workshop_capped_to_hut"),
+        (_has("mine"), "mine", "workshop_needs_mine"),
+        (Req("any", (_has("granary"), _has("road"))), "granary", "workshop_needs_granary_or_road"),
+    ), gates=(
+        (_has("mine"), "workshop_needs_mine"),
+        (Req("any", (_has("granary"), _has("road"))), "workshop_needs_granary_or_road"),
+        (_cap("workshop"), "workshop_already_exists"),
+    )),
+    "barracks": TechNode(redirects=(
+        (_cap("barracks"), "hut", "barracks_capped_to_hut"),
+        (_has("workshop"), "workshop", "barracks_needs_workshop"),
+    ), gates=(
+        (_has("workshop"), "barracks_needs_workshop"),
+        (_cap("barracks"), "barracks_already_exists"),
+    )),
+    "market": TechNode(redirects=(
+        (_cap("market"), "hut", "market_capped_to_hut"),
+        (_has("barracks"), "barracks", "market_needs_barracks"),
+    ), gates=(
+        (_ERA3, "market_needs_era3"),
+        (_has("barracks"), "market_needs_barracks"),
+        (_cap("market"), "market_already_exists"),
+    )),
+    # E5.10: temple and academy are unique world-wide, unlocked by any market / temple
+    "temple": TechNode(redirects=(
+        (_cap("temple", scope="world"), "hut", "temple_capped_to_hut"),
+        (_has("market", scope="world"), "market", "temple_needs_market"),
+    ), gates=(
+        (Req("era", n=3, scope="world"), "temple_needs_era3"),
+        (_has("market", scope="world"), "temple_needs_market"),
+        (_cap("temple", scope="world"), "temple_already_exists"),
+    )),
+    "academy": TechNode(redirects=(
+        (_cap("academy", scope="world"), "hut", "academy_capped_to_hut"),
+        (_has("temple", scope="world"), "temple", "academy_needs_temple"),
+    ), gates=(
+        (Req("era", n=3, scope="world"), "academy_needs_era3"),
+        (_has("temple", scope="world"), "academy_needs_temple"),
+        (_cap("academy", scope="world"), "academy_already_exists"),
+    )),
+    "walls": TechNode(redirects=(
+        (_cap("walls"), "hut", "walls_capped_to_hut"),
+        (_has("barracks"), "barracks", "walls_needs_barracks"),
+    ), gates=(
+        (_ERA3, "walls_needs_era3"),
+        (_has("barracks"), "walls_needs_barracks"),
+        (_cap("walls"), "walls_already_exists"),
+    )),
+    "irrigation": TechNode(redirects=(
+        (_cap("irrigation"), "hut", "irrigation_capped_to_hut"),
+        (_ERA4, "hut", "irrigation_needs_era4"),
+        (Req("subject", "agriculture"), "hut", "irrigation_needs_agriculture"),
+    ), gates=(
+        (_ERA4, "irrigation_needs_era4"),
+        (Req("subject", "agriculture"), "irrigation_needs_agriculture"),
+        (_cap("irrigation"), "irrigation_already_exists"),
+    )),
+    "library": TechNode(redirects=(
+        (_cap("library", scope="world"), "hut", "library_capped_to_hut"),
+        (Req("era", "inquiry", n=4, scope="world"), "hut", "library_needs_inquiry"),
+    ), gates=(
+        (Req("vacancy", ("library", "inquiry"), n=4, scope="world"), "library_needs_inquiry"),
+    )),
+    "foundry": TechNode(redirects=(
+        (_cap("foundry"), "hut", "foundry_capped_to_hut"),
+        (_ERA4, "hut", "foundry_needs_era4"),
+        (Req("subject", "craft"), "hut", "foundry_needs_craft"),
+    ), gates=(
+        (_ERA4, "foundry_needs_era4"),
+        (Req("subject", "craft"), "foundry_needs_craft"),
+        (_cap("foundry"), "foundry_already_exists"),
+    )),
+    "hall": TechNode(redirects=(
+        (_cap("hall"), "hut", "hall_capped_to_hut"),
+        (_ERA4, "hut", "hall_needs_era4"),
+        (Req("subject", "organisation"), "hut", "hall_needs_organisation"),
+    ), gates=(
+        (_ERA4, "hall_needs_era4"),
+        (Req("subject", "organisation"), "hall_needs_organisation"),
+        (_cap("hall"), "hall_already_exists"),
+    )),
+    "command": TechNode(redirects=(
+        (_cap("command"), "hut", "command_capped_to_hut"),
+        (_ERA4, "hut", "command_needs_era4"),
+        (Req("subject", "strategy"), "hut", "command_needs_strategy"),
+        (_has("barracks"), "barracks", "command_needs_barracks"),
+    ), gates=(
+        (_ERA4, "command_needs_era4"),
+        (Req("subject", "strategy"), "command_needs_strategy"),
+        (_has("barracks"), "command_needs_barracks"),
+        (_cap("command"), "command_already_exists"),
+    )),
+    "lab": TechNode(redirects=(
+        (_cap("lab"), "hut", "lab_capped_to_hut"),
+        (_ERA4, "hut", "lab_needs_era4"),
+        (Req("subject", "inquiry"), "hut", "lab_needs_inquiry"),
+        (_has("library"), "library", "lab_needs_library"),
+    ), gates=(
+        (_ERA4, "lab_needs_era4"),
+        (Req("subject", "inquiry"), "lab_needs_inquiry"),
+        (_has("library"), "lab_needs_library"),
+        (_cap("lab"), "lab_already_exists"),
+    )),
+    "observatory": TechNode(redirects=(
+        (_cap("observatory"), "hut", "observatory_capped_to_hut"),
+        (_ERA4, "hut", "observatory_needs_era4"),
+        (_has("lab"), "lab", "observatory_needs_lab"),
+    ), gates=(
+        (_ERA4, "observatory_needs_era4"),
+        (_has("lab"), "observatory_needs_lab"),
+        (_cap("observatory"), "observatory_already_exists"),
+    )),
+}
+
+_NO_NODE = TechNode()
+
+
+def _holds(req: Req, sm, sid) -> bool:
+    kind = req.kind
+    if kind == "any":
+        return any(_holds(r, sm, sid) for r in req.arg)
+    world = req.scope == "world"
+    if kind == "count" or kind == "cap":
+        code = BUILDING_CODES[req.arg]
+        have = sm.global_counts[code] if world else sm.structure_counts(sid)[code]
+        return have >= req.n if kind == "count" else have < req.n
+    if kind == "era":
+        if world:
+            return sm.any_settlement_at(req.n, req.arg)
+        return sm.get(sid).era >= req.n
+    if kind == "subject":
+        return req.arg in sm.get(sid).subjects
+    if kind == "total":
+        return sum(sm.structure_counts(sid)) >= req.n
+    if kind == "fed":
+        return sm.get(sid).starve_ticks <= 0
+    if kind == "vacancy":
+        code = BUILDING_CODES[req.arg[0]]
+        return any(sm.structure_counts(s)[code] < 1 for s in sm.settlements_at(req.n, req.arg[1]))
+    raise ValueError(f"unknown requirement kind: {kind}")
 
 
 def resolve_building(requested, agent_x, agent_y, sm, world) -> Tuple[str, str]:
     b = normalise_building_name(requested)
-    note = ""
+    best_sid = sm.nearest(agent_x, agent_y) if sm.count() else None
+    return _resolve_for(b, best_sid, sm, world)
+
+
+def _resolve_for(b, best_sid, sm, world) -> Tuple[str, str]:
+    early = _resolve_early(b, best_sid, sm, world)
+    return early if early is not None else _redirect_for(b, best_sid, sm)
 
+
+def _resolve_early(b, best_sid, sm, world) -> Optional[Tuple[str, str]]:
+    # bootstrap and the world-wide library priority come before any per-building rule
     total_structures = len(getattr(world, "structures", []) or [])
     if sm.count() == 0 or total_structures == 0:
         return "farm", "bootstrap_force_farm" if b != "farm" else ""
-
-    best_sid = sm.nearest(agent_x, agent_y)
     if best_sid is None:
         return "farm", "bootstrap_force_farm"
 
-    (farms, stor, gran, mine, road, workshop, barracks, market, temple,
-     academy, walls, irrigation, library, foundry, hall, command, lab, observatory, total) = _settlement_struct_counts(best_sid, sm, world)
-
-    s = sm.get(best_sid)
-    era = int(s.get("era", 2))
-    subjects = s.get("subjects") or []
-
-    any_inquiry = any(
-        int(ss.get("era", 2)) >= 4 and "inquiry" in (ss.get("subjects") or [])
-        for ss in sm.settlements.values()
-    )
-    any_library = any(
-        sm.count_structures_of_type(sid, "library", world) >= 1
-        for sid in sm.settlements
-    )
-    if any_inquiry and not any_library and b in LIBRARY_PRIORITY_TARGETS:
-        return "library", "redirected_to_library_priority"
-    if any_inquiry and not any_library and b == "library":
-        return "library", ""
-
-    if farms == 0:
-        return "farm", "redirected_to_farm" if b != "farm" else ""
-
-    if b == "storage" and stor >= 1:
-        return "hut", "storage_capped_to_hut"
-
-    if b == "farm" and farms >= FARM_SOFT_CAP:
-        if stor >= 1:
-            return "hut", "farm_capped_to_hut"
-        return "storage", "farm_capped_to_storage"
-
-    if b == "granary":
-        if gran >= 1:
-            return "hut", "granary_capped_to_hut"
-        if stor < 1:
-            return "storage", "granary_needs_storage"
-        if farms < 1:
-            return "farm", "granary_needs_farm"
-
-    if b == "mine":
-        if mine >= 1:
-            return "hut", "mine_capped_to_hut"
-        if stor < 1:
-            return "storage", "mine_needs_storage"
-        if farms < 1:
-            return "farm", "mine_needs_farm"
-
-    if b == "road":
-        if mine < 1 and total < 4:
-            if stor < 1:
-                return "storage", "road_needs_base"
-            return "farm", "road_needs_base"
-
-    if b == "workshop":
-        if workshop >= 1:
-            return "hut", "workshop_capped_to_hut"
-        if mine < 1:
-            return "mine", "workshop_needs_mine"
-        if gran < 1 and road < 1:
-            return "granary", "workshop_needs_granary_or_road"
-
-    if b == "barracks":
-        if barracks >= 1:
-            return "hut", "barracks_capped_to_hut"
-        if workshop < 1:
-            return "workshop", "barracks_needs_workshop"
-
-    if b == "market":
-        if market >= 1:
-            return "hut", "market_capped_to_hut"
-        if barracks < 1:
-            return "barracks", "market_needs_barracks"
-
-    if b == "temple":
-        any_temple = any(sm.count_structures_of_type(sid, "temple", world) >= 1 for sid in sm.settlements)
-        any_market = any(sm.count_structures_of_type(sid, "market", world) >= 1 for sid in sm.settlements)
-        if any_temple:
-            return "hut", "temple_capped_to_hut"
-        if not any_market:
-            return "market", "temple_needs_market"
-
-    if b == "academy":
-        any_academy = any(sm.count_structures_of_type(sid, "academy", world) >= 1 for sid in sm.settlements)
-        any_temple = any(sm.count_structures_of_type(sid, "temple", world) >= 1 for sid in sm.settlements)
-        if any_academy:
-            return "hut", "academy_capped_to_hut"
-        if not any_temple:
-            return "temple", "academy_needs_temple"
-
-    if b == "walls":
-        if walls >= 1:
-            return "hut", "walls_capped_to_hut"
-        if barracks < 1:
-            return "barracks", "walls_needs_barracks"
-
-    if b == "irrigation":
-        if irrigation >= 1:
-            return "hut", "irrigation_capped_to_hut"
-        if era < 4:
-            return "hut", "irrigation_needs_era4"
-        if "agriculture" not in subjects:
-            return "hut", "irrigation_needs_agriculture"
-
-    if b == "library":
-        if any_library:
-            return "hut", "library_capped_to_hut"
-        if not any_inquiry:
-            return "hut", "library_needs_inquiry"
-
-    if b == "foundry":
-        if foundry >= 1:
-            return "hut", "foundry_capped_to_hut"
-        if era < 4:
-            return "hut", "foundry_needs_era4"
-        if "craft" not in subjects:
-            return "hut", "foundry_needs_craft"
-
-    if b == "hall":
-        if hall >= 1:
-            return "hut", "hall_capped_to_hut"
-        if era < 4:
-            return "hut", "hall_needs_era4"
-        if "organisation" not in subjects:
-            return "hut", "hall_needs_organisation"
-
-    if b == "command":
-        if command >= 1:
-            return "hut", "command_capped_to_hut"
-        if era < 4:
-            return "hut", "command_needs_era4"
-        if "strategy" not in subjects:
-            return "hut", "command_needs_strategy"
-        if barracks < 1:
-            return "barracks", "command_needs_barracks"
-
-    if b == "lab":
-        if lab >= 1:
-            return "hut", "lab_capped_to_hut"
-        if era < 4:
-            return "hut", "lab_needs_era4"
-        if "inquiry" not in subjects:
-            return "hut", "lab_needs_inquiry"
-        if library < 1:
-            return "library", "lab_needs_library"
-
-    if b == "observatory":
-        if observatory >= 1:
-            return "hut", "observatory_capped_to_hut"
-        if era < 4:
-            return "hut", "observatory_needs_era4"
-        if lab < 1:
-            return "lab", "observatory_needs_lab"
-
-    return b, note
-
-
-def can_build_hut(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "hut_requires_storage"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "hut_requires_storage"
-    if sm.count_structures_of_type(best_sid, "storage", world) == 0:
-        return False, "hut_requires_storage"
-    if int(sm.get(best_sid).get("starve_ticks", 0)) > 0:
-        return False, "hut_blocked_while_starving"
-    return True, ""
-
-
-def can_build_granary(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "granary_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "granary_needs_settlement"
-    if sm.count_structures_of_type(best_sid, "storage", world) < 1:
-        return False, "granary_needs_storage"
-    if sm.count_structures_of_type(best_sid, "farm", world) < 1:
-        return False, "granary_needs_farm"
-    if sm.count_structures_of_type(best_sid, "granary", world) >= 1:
-        return False, "granary_already_exists"
-    return True, ""
-
-
-def can_build_mine(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "mine_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "mine_needs_settlement"
-    if sm.count_structures_of_type(best_sid, "storage", world) < 1:
-        return False, "mine_needs_storage"
-    if sm.count_structures_of_type(best_sid, "farm", world) < 1:
-        return False, "mine_needs_farm"
-    if sm.count_structures_of_type(best_sid, "mine", world) >= 1:
-        return False, "mine_already_exists"
-    return True, ""
-
-
-def can_build_road(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "road_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "road_needs_settlement"
-    farms, stor, gran, mine, road, workshop, barracks, market, temple, academy, walls, irrigation, library, foundry, hall, command, lab, observatory, total = _settlement_struct_counts(best_sid, sm, world)
-    if mine < 1 and total < 4:
-        return False, "road_needs_mine_or_growth"
-    return True, ""
-
-
-def can_build_workshop(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "workshop_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "workshop_needs_settlement"
-    farms, stor, gran, mine, road, workshop, barracks, market, temple, academy, walls, irrigation, library, foundry, hall, command, lab, observatory, total = _settlement_struct_counts(best_sid, sm, world)
-    if mine < 1:
-        return False, "workshop_needs_mine"
-    if gran < 1 and road < 1:
-        return False, "workshop_needs_granary_or_road"
-    if workshop >= 1:
-        return False, "workshop_already_exists"
-    return True, ""
-
-
-def can_build_barracks(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "barracks_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "barracks_needs_settlement"
-    farms, stor, gran, mine, road, workshop, barracks, market, temple, academy, walls, irrigation, library, foundry, hall, command, lab, observatory, total = _settlement_struct_counts(best_sid, sm, world)
-    if workshop < 1:
-        return False, "barracks_needs_workshop"
-    if barracks >= 1:
-        return False, "barracks_already_exists"
-    return True, ""
-
-
-def can_build_market(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "market_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "market_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 3:
-        return False, "market_needs_era3"
-    farms, stor, gran, mine, road, workshop, barracks, market, temple, academy, walls, irrigation, library, foundry, hall, command, lab, observatory, total = _settlement_struct_counts(best_sid, sm, world)
-    if barracks < 1:
-        return False, "market_needs_barracks"
-    if market >= 1:
-        return False, "market_already_exists"
-    return True, ""
-
-
-def can_build_temple(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "temple_needs_settlement"
-    # E5.10: any settlement with market unlocks temple globally (one temple total)
-    any_market = any(sm.count_structures_of_type(sid, "market", world) >= 1 for sid in sm.settlements)
-    any_temple = any(sm.count_structures_of_type(sid, "temple", world) >= 1 for sid in sm.settlements)
-    any_era3 = any(int(s.get("era", 2)) >= 3 for s in sm.settlements.values())
-    if not any_era3:
-        return False, "temple_needs_era3"
-    if not any_market:
-        return False, "temple_needs_market"
-    if any_temple:
-        return False, "temple_already_exists"
-    return True, ""
-
-
-def can_build_academy(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "academy_needs_settlement"
-    # E5.10: any temple unlocks academy globally
-    any_temple = any(sm.count_structures_of_type(sid, "temple", world) >= 1 for sid in sm.settlements)
-    any_academy = any(sm.count_structures_of_type(sid, "academy", world) >= 1 for sid in sm.settlements)
-    any_era3 = any(int(s.get("era", 2)) >= 3 for s in sm.settlements.values())
-    if not any_era3:
-        return False, "academy_needs_era3"
-    if not any_temple:
-        return False, "academy_needs_temple"
-    if any_academy:
-        return False, "academy_already_exists"
-    return True, ""
-
-
-def can_build_walls(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "walls_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "walls_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 3:
-        return False, "walls_needs_era3"
-    farms, stor, gran, mine, road, workshop, barracks, market, temple, academy, walls, irrigation, library, foundry, hall, command, lab, observatory, total = _settlement_struct_counts(best_sid, sm, world)
-    if barracks < 1:
-        return False, "walls_needs_barracks"
-    if walls >= 1:
-        return False, "walls_already_exists"
-    return True, ""
-
+    if sm.any_settlement_at(4, "inquiry") and not sm.any_structure_of_type("library"):
+        if b in LIBRARY_PRIORITY_TARGETS:
+            return "library", "redirected_to_library_priority"
+        if b == "library":
+            return "library", ""
+    return None
 
-def can_build_irrigation(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "irrigation_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "irrigation_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 4:
-        return False, "irrigation_needs_era4"
-    if "agriculture" not in (s.get("subjects") or []):
-        return False, "irrigation_needs_agriculture"
-    if sm.count_structures_of_type(best_sid, "irrigation", world) >= 1:
-        return False, "irrigation_already_exists"
-    return True, ""
-
-
-def can_build_library(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "library_needs_settlement"
-    for sid, s in sm.settlements.items():
-        if int(s.get("era", 2)) >= 4 and "inquiry" in (s.get("subjects") or []):
-            if sm.count_structures_of_type(sid, "library", world) < 1:
-                return True, ""
-    return False, "library_needs_inquiry"
-
-
-def can_build_foundry(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "foundry_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "foundry_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 4:
-        return False, "foundry_needs_era4"
-    if "craft" not in (s.get("subjects") or []):
-        return False, "foundry_needs_craft"
-    if sm.count_structures_of_type(best_sid, "foundry", world) >= 1:
-        return False, "foundry_already_exists"
-    return True, ""
 
+def _redirect_for(b, best_sid, sm) -> Tuple[str, str]:
+    if sm.structure_counts(best_sid)[BUILDING_CODES["farm"]] == 0:
+        return "farm", "redirected_to_farm" if b != "farm" else ""
 
-def can_build_hall(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "hall_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "hall_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 4:
-        return False, "hall_needs_era4"
-    if "organisation" not in (s.get("subjects") or []):
-        return False, "hall_needs_organisation"
-    if sm.count_structures_of_type(best_sid, "hall", world) >= 1:
-        return False, "hall_already_exists"
-    return True, ""
+    for req, target, note in TECH_TREE.get(b, _NO_NODE).redirects:
+        if not _holds(req, sm, best_sid):
+            return target, note
+    return b, ""
 
 
-def can_build_command(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "command_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "command_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 4:
-        return False, "command_needs_era4"
-    if "strategy" not in (s.get("subjects") or []):
-        return False, "command_needs_strategy"
-    if sm.count_structures_of_type(best_sid, "barracks", world) < 1:
-        return False, "command_needs_barracks"
-    if sm.count_structures_of_type(best_sid, "command", world) >= 1:
-        return False, "command_already_exists"
-    return True, ""
+def can_build(b, agent_x, agent_y, sm, world) -> Tuple[bool, str]:
+    """Whether `b` may be built at (agent_x, agent_y); unknown names pass."""
+    best_sid = sm.nearest(agent_x, agent_y) if sm.count() else None
+    return _gate_for(b, best_sid, sm)
 
 
-def can_build_lab(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "lab_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
+def _gate_for(b, best_sid, sm) -> Tuple[bool, str]:
+    node = TECH_TREE.get(b, _NO_NODE)
+    if not node.gates:
+        return True, ""
     if best_sid is None:
-        return False, "lab_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 4:
-        return False, "lab_needs_era4"
-    if "inquiry" not in (s.get("subjects") or []):
-        return False, "lab_needs_inquiry"
-    if sm.count_structures_of_type(best_sid, "library", world) < 1:
-        return False, "lab_needs_library"
-    if sm.count_structures_of_type(best_sid, "lab", world) >= 1:
-        return False, "lab_already_exists"
+        return False, node.no_settlement or f"{b}_needs_settlement"
+    for req, note in node.gates:
+        if not _holds(req, sm, best_sid):
+            return False, note
     return True, ""
 
 
-def can_build_observatory(agent_x, agent_y, sm, world) -> Tuple[bool, str]:
-    if sm.count() == 0:
-        return False, "observatory_needs_settlement"
-    best_sid = sm.nearest(agent_x, agent_y)
-    if best_sid is None:
-        return False, "observatory_needs_settlement"
-    s = sm.get(best_sid)
-    if int(s.get("era", 2)) < 4:
-        return False, "observatory_needs_era4"
-    if sm.count_structures_of_type(best_sid, "lab", world) < 1:
-        return False, "observatory_needs_lab"
-    if sm.count_structures_of_type(best_sid, "observatory", world) >= 1:
-        return False, "observatory_already_exists"
-    return True, ""
+def legal_build_mask(sid, sm, world) -> int:
+    """Bitmask over `Building` codes: bit `Building.X` is set when asking to
+    build X next to settlement `sid` (None: no settlement yet) will not be
+    refused, i.e. whatever the request is redirected to passes its gate.
+    Tile occupancy and costs are not part of the mask."""
+    mask = 0
+    for code, name in enumerate(BUILDING_NAMES):
+        b, _ = _resolve_for(name, sid, sm, world)
+        if _gate_for(b, sid, sm)[0]:
+            mask |= 1 << code
+    return mask
+
+
+def _world_scoped(req: Req) -> bool:
+    if req.kind == "any":
+        return any(_world_scoped(r) for r in req.arg)
+    return req.scope == "world"
+
+
+# buildings whose answers can change when some other settlement changes
+_WORLD_SCOPED = frozenset(
+    b for b, node in TECH_TREE.items()
+    if any(_world_scoped(rule[0]) for rule in node.redirects + node.gates)
+)
+
+
+class GateCache:
+    """Memoised resolve_building / can_build / legal_build_mask for one run.
+
+    Answers are kept per (nearest settlement, building) and reused while that
+    settlement's `sm.state_version()` is unchanged; buildings with world-scoped
+    requirements (and whole masks) are also tied to `sm.world_version`.
+    """
+
+    def __init__(self):
+        self._redirects: Dict[Tuple[str, str], Tuple[Tuple[int, int], Tuple[str, str]]] = {}
+        self._gates: Dict[Tuple[str, str], Tuple[Tuple[int, int], Tuple[bool, str]]] = {}
+        self._masks: Dict[Optional[str], Tuple[Tuple[int, int, int], int]] = {}
+
+    @staticmethod
+    def _version(b, sid, sm) -> Tuple[int, int]:
+        return sm.state_version(sid), (sm.world_version if b in _WORLD_SCOPED else -1)
+
+    def resolve(self, requested, agent_x, agent_y, sm, world) -> Tuple[str, str]:
+        b = normalise_building_name(requested)
+        sid = sm.nearest(agent_x, agent_y) if sm.count() else None
+        early = _resolve_early(b, sid, sm, world)
+        if early is not None:
+            return early
+        key, ver = (sid, b), self._version(b, sid, sm)
+        hit = self._redirects.get(key)
+        if hit is not None and hit[0] == ver:
+            return hit[1]
+        res = _redirect_for(b, sid, sm)
+        self._redirects[key] = (ver, res)
+        return res
+
+    def can_build(self, b, agent_x, agent_y, sm, world) -> Tuple[bool, str]:
+        sid = sm.nearest(agent_x, agent_y) if sm.count() else None
+        if sid is None:
+            return _gate_for(b, sid, sm)
+        key, ver = (sid, b), self._version(b, sid, sm)
+        hit = self._gates.get(key)
+        if hit is not None and hit[0] == ver:
+            return hit[1]
+        res = _gate_for(b, sid, sm)
+        self._gates[key] = (ver, res)
+        return res
+
+    def mask(self, sid, sm, world) -> int:
+        """Cached `legal_build_mask(sid, sm, world)`."""
+        ver = (sm.world_version, sm.state_version(sid) if sid else 0, len(world.structures))
+        hit = self._masks.get(sid)
+        if hit is not None and hit[0] == ver:
+            return hit[1]
+        mask = legal_build_mask(sid, sm, world)
+        self._masks[sid] = (ver, mask)
+        return mask
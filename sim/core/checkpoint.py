@@ -0,0 +1,34 @@
+"""Binary checkpoints of a running Simulation.
+
+A checkpoint is a magic header followed by a zlib-compressed pickle of the
+simulation's state (world, agents, structures, settlements, metrics, brains,
+scenario, governor and the RNG). Files are replaced atomically, so a crash
+mid-write leaves the previous checkpoint intact.
+"""
+import os
+import pickle
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Union
+
+MAGIC = b"AIWCKPT1"
+CHECKPOINT_NAME = "checkpoint.bin"
+
+
+def save_checkpoint(path: Union[str, Path], state: Dict[str, Any]) -> None:
+    path = Path(path)
+    data = MAGIC + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 6)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Union[str, Path]) -> Dict[str, Any]:
+    """Read a checkpoint file, or the one inside a run directory."""
+    path = Path(path)
+    if path.is_dir():
+        path = path / CHECKPOINT_NAME
+    data = path.read_bytes()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a simulation checkpoint")
+    return pickle.loads(zlib.decompress(data[len(MAGIC):]))
@@ -10,6 +10,13 @@ from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
 
+def setup_commands(raw: Optional[str]) -> List[str]:
+    """The commands in `raw` that only take effect at reset (everything but
+    timed `event`s): seed, ticks, agents, start_*."""
+    return [part.strip() for part in (raw or "").split(";")
+            if part.strip() and part.split()[0].lower() != "event"]
+
+
 @dataclass
 class ScenarioEvent:
     tick: int
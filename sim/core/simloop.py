@@ -1,23 +1,20 @@
+import copy
 import json
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 
 from sim.core.rng import RNG
 from sim.world.config import WorldConfig
 from sim.world.map import make_world
 from sim.log.run_id import make_run_id
-from sim.log.logger import RunLogger
-
-from sim.world.state import Structure
-from sim.world.settlements import SettlementManager, SETTLEMENT_RULES
-from sim.core.build_governors import (
-    resolve_building, can_build_hut, can_build_granary, can_build_mine, can_build_road,
-    can_build_workshop, can_build_barracks, can_build_market, can_build_temple,
-    can_build_academy, can_build_walls, can_build_irrigation, can_build_library,
-    can_build_foundry, can_build_hall, can_build_command, can_build_lab, can_build_observatory,
-)
+from sim.log.logger import FlushPolicy, LogLevels, NullLogger, RunLogger, ThreadedRunLogger
+
+from sim.world.settlements import SettlementManager, SettlementRules
+from sim.core.build_governors import GateCache
+from sim.core.checkpoint import CHECKPOINT_NAME, load_checkpoint, save_checkpoint
 from sim.core.governor import Governor
-from sim.core.scenario import Scenario
+from sim.core.scenario import Scenario, setup_commands
 from sim.agents.types import Observation, Action
 from sim.agents.baseline_random import RandomAgent
 from sim.agents.controlled_agent import ControlledAgent
@@ -50,57 +47,21 @@ STACKABLE = {"storage", "farm", "granary", "mine", "road", "workshop", "barracks
              "foundry", "hall", "command", "lab", "observatory"}
 
 
-def run_sim(
-    seed: int, ticks: int, snapshot_every: int,
-    agent_kind: str = "utility", policy_weights: dict = None, return_score: bool = False,
-    governor_command: Optional[str] = None, scenario_commands: Optional[str] = None,
-    control_agent_id: Optional[str] = None, control_policy: str = "idle", num_agents: int = 4,
-    quiet: bool = False,
-):
-    scenario = Scenario()
-    if scenario_commands:
-        scenario.apply_commands(scenario_commands)
-    if scenario.seed is not None:
-        seed = scenario.seed
-    if scenario.ticks is not None:
-        ticks = scenario.ticks
-    if scenario.num_agents is not None:
-        num_agents = scenario.num_agents
-
-    run_id = make_run_id()
-    run_dir = Path("runs") / run_id
-    logger = RunLogger(run_dir, quiet=quiet)
-    cfg = WorldConfig()
-    rng = RNG(seed)
-    world = make_world(cfg, rng, num_agents=num_agents)
-
-    if scenario.start_food or scenario.start_wood or scenario.start_stone:
-        for a in world.agents:
-            a.inv_food, a.inv_wood, a.inv_stone = scenario.start_food, scenario.start_wood, scenario.start_stone
-        logger.event({"type": "scenario_start_inventory", "tick": 0,
-                      "food": scenario.start_food, "wood": scenario.start_wood, "stone": scenario.start_stone})
-
-    gov = Governor()
-    if governor_command:
-        status = gov.apply_command(governor_command)
-        logger.event({"type": "governor_command", "tick": 0, "command": governor_command,
-                      "status": status, "state": gov.to_dict()})
-    if scenario_commands:
-        logger.event({"type": "scenario_loaded", "tick": 0, "commands": scenario_commands, "state": scenario.to_dict()})
-
-    if agent_kind == "utility":
-        from sim.agents.utility_agent import UtilityAgent
-        w = policy_weights or {}
-        bias = gov.bias_weights()
-        brains = {a.agent_id: UtilityAgent(a.agent_id, w, governor_bias=bias) for a in world.agents}
-    else:
-        brains = {a.agent_id: RandomAgent(a.agent_id) for a in world.agents}
-
-    if control_agent_id and control_agent_id in brains:
-        brains[control_agent_id] = ControlledAgent(control_agent_id, policy=control_policy)
-        logger.event({"type": "agent_controlled", "tick": 0, "agent_id": control_agent_id, "policy": control_policy})
-
-    metrics = {
+@dataclass
+class RunResult:
+    """What a headless run hands back instead of a runs/<id>/ directory."""
+    run_id: str
+    score: int
+    summary: Dict[str, Any]  # same content as summary.json
+    state: Optional[Dict[str, Any]] = None  # Simulation.state() at the end, if asked for
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        return self.summary["metrics"]
+
+
+def _new_metrics() -> Dict[str, Any]:
+    return {
         "settlements_created": 0,
         "food_deposited_total": 0, "food_deposit_events": 0,
         "wood_deposited_total": 0, "wood_deposit_events": 0,
@@ -118,266 +79,568 @@ def run_sim(
         "market_wood_total": 0, "market_stone_total": 0, "temple_food_total": 0,
         "academy_knowledge_total": 0, "subject_unlock_events": 0,
     }
-    sm = SettlementManager(metrics=metrics, logger=logger)
-    drought_active = False
-
-    (run_dir / "config.json").write_text(json.dumps({
-        "seed": seed, "ticks": ticks, "num_agents": num_agents, "snapshot_every": snapshot_every,
-        "quiet": quiet,
-        "world": cfg.__dict__, "build_costs": BUILD_COSTS, "settlement_rules": SETTLEMENT_RULES,
-        "governor": gov.to_dict(), "scenario": scenario.to_dict(),
-    }, indent=2), encoding="utf-8")
 
-    logger.event({"type": "run_started", "run_id": run_id, "seed": seed, "num_agents": num_agents})
 
-    for t in range(ticks):
+class Simulation:
+    """One deterministic run that can be advanced tick by tick.
+
+    Takes the same parameters as `run_sim`. `step()` / `run_until()` advance
+    the run, `state()` reads it, and `close()` writes summary.json and
+    returns the score. Stepping a run in pieces gives the same outputs as
+    running it in one go.
+
+    With headless=True nothing is written: events go to a NullLogger and the
+    summary is only kept in memory (`self.summary` after close()).
+
+    With checkpoint_every=N the full state is saved to runs/<id>/checkpoint.bin
+    every N ticks; `Simulation.resume()` picks the run up from there.
+    """
+
+    # left out of checkpoints: rebuilt or reset by resume()
+    _NOT_CHECKPOINTED = ("logger", "run_dir", "headless", "gates", "closed", "score", "summary")
+
+    def __init__(
+        self, seed: int, ticks: int, snapshot_every: int,
+        agent_kind: str = "utility", policy_weights: dict = None,
+        governor_command: Optional[str] = None, scenario_commands: Optional[str] = None,
+        control_agent_id: Optional[str] = None, control_policy: str = "idle", num_agents: int = 4,
+        quiet: bool = False, settlement_rules: Optional[Dict[str, Any]] = None,
+        obs_radius: Optional[int] = None, mask_builds: bool = False, headless: bool = False,
+        checkpoint_every: int = 0, log_level: Optional[str] = None,
+        log_overrides: Optional[Dict[str, str]] = None, async_log: bool = False, log_queue_size: int = 64,
+        flush_every: int = 1000, flush_ms: float = 250.0, event_format: str = "jsonl",
+        segment_ticks: int = 0, compression: Optional[str] = None,
+    ):
+        self.params = dict(
+            seed=seed, ticks=ticks, snapshot_every=snapshot_every, agent_kind=agent_kind,
+            policy_weights=policy_weights, governor_command=governor_command,
+            scenario_commands=scenario_commands, control_agent_id=control_agent_id,
+            control_policy=control_policy, num_agents=num_agents, quiet=quiet,
+            settlement_rules=settlement_rules, obs_radius=obs_radius, mask_builds=mask_builds,
+            checkpoint_every=checkpoint_every, log_level=log_level, log_overrides=log_overrides,
+            async_log=async_log, log_queue_size=log_queue_size, flush_every=flush_every, flush_ms=flush_ms,
+            event_format=event_format, segment_ticks=segment_ticks, compression=compression,
+        )
+        self.headless = headless
+        self.logger: Optional[RunLogger] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a fresh run (new run id) from the constructor parameters.
+
+        A run still open is discarded: its log is closed without a summary.
+        """
+        if self.logger is not None and not self.closed:
+            self.logger.close()
+        p = self.params
+        seed, ticks, num_agents = p["seed"], p["ticks"], p["num_agents"]
+        scenario_commands, governor_command = p["scenario_commands"], p["governor_command"]
+
+        scenario = Scenario()
+        if scenario_commands:
+            scenario.apply_commands(scenario_commands)
+        if scenario.seed is not None:
+            seed = scenario.seed
+        if scenario.ticks is not None:
+            ticks = scenario.ticks
+        if scenario.num_agents is not None:
+            num_agents = scenario.num_agents
+        self.scenario = scenario
+        self.seed, self.ticks, self.num_agents = seed, ticks, num_agents
+        self.snapshot_every = p["snapshot_every"]
+        self.obs_radius, self.mask_builds = p["obs_radius"], p["mask_builds"]
+        self.checkpoint_every = p["checkpoint_every"]
+
+        self.rules = rules = SettlementRules.build(p["settlement_rules"])
+
+        self.run_id = make_run_id()
+        if self.headless:
+            self.run_dir: Optional[Path] = None
+            self.logger = logger = NullLogger()
+        else:
+            self.run_dir = Path("runs") / self.run_id
+            self.logger = logger = self._open_logger()
+        self.cfg = cfg = WorldConfig()
+        self.rng = RNG(seed)
+        self.world = world = make_world(cfg, self.rng, num_agents=num_agents)
+        self.caps = {"food": cfg.max_food, "wood": cfg.max_wood, "stone": cfg.max_stone}
+
+        if scenario.start_food or scenario.start_wood or scenario.start_stone:
+            world.agents.set_inventory(scenario.start_food, scenario.start_wood, scenario.start_stone)
+            logger.event({"type": "scenario_start_inventory", "tick": 0,
+                          "food": scenario.start_food, "wood": scenario.start_wood, "stone": scenario.start_stone})
+
+        self.gov = gov = Governor()
+        if governor_command:
+            status = gov.apply_command(governor_command)
+            logger.event({"type": "governor_command", "tick": 0, "command": governor_command,
+                          "status": status, "state": gov.to_dict()})
+        if scenario_commands:
+            logger.event({"type": "scenario_loaded", "tick": 0, "commands": scenario_commands, "state": scenario.to_dict()})
+
+        if p["agent_kind"] == "utility":
+            from sim.agents.utility_agent import UtilityAgent
+            w = p["policy_weights"] or {}
+            bias = gov.bias_weights()
+            brains = {a.agent_id: UtilityAgent(a.agent_id, w, governor_bias=bias, mask_builds=self.mask_builds)
+                      for a in world.agents}
+        else:
+            brains = {a.agent_id: RandomAgent(a.agent_id) for a in world.agents}
+
+        control_agent_id, control_policy = p["control_agent_id"], p["control_policy"]
+        if control_agent_id and control_agent_id in brains:
+            brains[control_agent_id] = ControlledAgent(control_agent_id, policy=control_policy)
+            logger.event({"type": "agent_controlled", "tick": 0, "agent_id": control_agent_id, "policy": control_policy})
+        self.brains = brains
+
+        self.metrics = _new_metrics()
+        self.sm = SettlementManager(metrics=self.metrics, logger=logger, rules=rules)
+        self.gates = GateCache()
+        self.drought_active = False
+        self.t = 0  # ticks run so far
+        self.closed = False
+        self.score: Optional[int] = None
+        self.summary: Optional[Dict[str, Any]] = None
+
+        if self.run_dir is not None:
+            (self.run_dir / "config.json").write_text(json.dumps({
+                "seed": seed, "ticks": ticks, "num_agents": num_agents, "snapshot_every": self.snapshot_every,
+                "quiet": p["quiet"], "obs_radius": self.obs_radius, "mask_builds": self.mask_builds,
+                "checkpoint_every": self.checkpoint_every,
+                "log_level": logger.levels.level, "log_overrides": logger.levels.overrides,
+                "event_format": logger.event_format, "segment_ticks": logger.segment_ticks,
+                "compression": logger.compression,
+                "world": cfg.__dict__, "build_costs": BUILD_COSTS, "settlement_rules": rules.to_dict(),
+                "governor": gov.to_dict(), "scenario": scenario.to_dict(),
+            }, indent=2), encoding="utf-8")
+
+        logger.event({"type": "run_started", "run_id": self.run_id, "seed": seed, "num_agents": num_agents})
+
+    def _open_logger(self, resume_at: Optional[Tuple[Any, Any]] = None) -> RunLogger:
+        p = self.params
+        levels = LogLevels(p.get("log_level") or ("key" if p["quiet"] else "all"), p.get("log_overrides"))
+        flush = FlushPolicy(p.get("flush_every", 1000), p.get("flush_ms", 250.0))
+        files = dict(event_format=p.get("event_format", "jsonl"), segment_ticks=p.get("segment_ticks", 0),
+                     compression=p.get("compression"))
+        if p.get("async_log"):
+            return ThreadedRunLogger(self.run_dir, quiet=p["quiet"], resume_at=resume_at, levels=levels,
+                                     flush=flush, queue_size=p["log_queue_size"], **files)
+        return RunLogger(self.run_dir, quiet=p["quiet"], resume_at=resume_at, levels=levels, flush=flush, **files)
+
+    @property
+    def done(self) -> bool:
+        return self.closed or self.t >= self.ticks
+
+    def step(self, n: int = 1) -> int:
+        """Run up to `n` more ticks (never past `ticks`); returns ticks run so far."""
+        for _ in range(n):
+            if self.done:
+                break
+            self._tick(self.t)
+            self.t += 1
+            if self.checkpoint_every > 0 and self.t % self.checkpoint_every == 0 and self.run_dir is not None:
+                self.save_checkpoint()
+        return self.t
+
+    def save_checkpoint(self, path: Optional[Union[str, Path]] = None) -> Path:
+        """Write the full run state to `path` (default runs/<id>/checkpoint.bin)."""
+        if path is None:
+            if self.run_dir is None:
+                raise ValueError("headless run: save_checkpoint() needs a path")
+            path = self.run_dir / CHECKPOINT_NAME
+        state = {k: v for k, v in self.__dict__.items() if k not in self._NOT_CHECKPOINTED}
+        state["logged"] = self.run_dir is not None
+        state["log_position"] = self.logger.position()
+        save_checkpoint(path, state)
+        return Path(path)
+
+    @classmethod
+    def resume(cls, path: Union[str, Path], ticks: Optional[int] = None,
+               headless: bool = False) -> "Simulation":
+        """Continue a run from a checkpoint file or a run directory holding one.
+
+        Logging picks up in the checkpoint's run directory: anything written
+        there after the checkpoint is dropped, so the finished logs match an
+        uninterrupted run. `ticks` extends (or shortens) the run length.
+        """
+        path = Path(path)
+        if path.is_dir():
+            path = path / CHECKPOINT_NAME
+        state = load_checkpoint(path)
+        logged, log_position = state.pop("logged"), state.pop("log_position")
+        sim = cls.__new__(cls)
+        sim.__dict__.update(state)
+        sim.headless = headless or not logged
+        if sim.headless:
+            sim.run_dir = None
+            sim.logger = NullLogger()
+        else:
+            sim.run_dir = path.parent
+            sim.logger = sim._open_logger(resume_at=log_position)
+        sim.sm.logger = sim.logger
+        sim.gates = GateCache()
+        sim.closed = False
+        sim.score = None
+        sim.summary = None
+        if ticks is not None:
+            sim.ticks = ticks
+        return sim
+
+    def fork(self, governor_command: Optional[str] = None, scenario_commands: Optional[str] = None,
+             ticks: Optional[int] = None) -> "Simulation":
+        """Clone the live run into an independent headless branch.
+
+        The branch starts at the current tick with its own copy of the world,
+        settlements, RNG and brains; the tile grid is shared copy-on-write.
+        `governor_command` replaces the governor's preferences and the timed
+        events in `scenario_commands` are added before the branch runs on;
+        setup commands (seed, agents, ticks, start_*) raise ValueError.
+        This run is left untouched.
+        """
+        self._check_branch(scenario_commands=scenario_commands)
+        state = {k: v for k, v in self.__dict__.items() if k not in self._NOT_CHECKPOINTED}
+        sim = type(self).__new__(type(self))
+        sim.__dict__.update(copy.deepcopy(state))
+        sim.gates = GateCache()
+        sim._branch(governor_command, scenario_commands, ticks)
+        return sim
+
+    @staticmethod
+    def _check_branch(scenario_commands: Optional[str] = None, **_: Any) -> None:
+        """Refuse branch scenarios with commands that only apply at reset."""
+        setup = setup_commands(scenario_commands)
+        if setup:
+            raise ValueError(f"branch scenarios take only timed events, not setup commands: {'; '.join(setup)}")
+
+    def _branch(self, governor_command: Optional[str] = None, scenario_commands: Optional[str] = None,
+                ticks: Optional[int] = None) -> None:
+        """Turn this run, in place, into a headless what-if branch (see fork())."""
+        self.headless = True
+        self.run_dir = None
+        self.logger = self.sm.logger = NullLogger()
+        self.run_id = make_run_id()
+        self.closed = False
+        self.score = None
+        self.summary = None
+        if ticks is not None:
+            self.ticks = ticks
+        if scenario_commands:
+            self.scenario.apply_commands(scenario_commands)
+        if governor_command:
+            self.gov.apply_command(governor_command)
+            bias = self.gov.bias_weights()
+            for brain in self.brains.values():
+                if hasattr(brain, "governor_bias"):
+                    brain.governor_bias = bias
+
+    def run_until(self, until: Union[int, Callable[["Simulation"], bool]]) -> int:
+        """Step until `until` ticks have run, or until the predicate
+        `until(sim)` is true after a tick; stops early at `ticks`."""
+        if callable(until):
+            while not self.done:
+                self.step()
+                if until(self):
+                    break
+        else:
+            while not self.done and self.t < until:
+                self.step()
+        return self.t
+
+    def state(self) -> Dict[str, Any]:
+        """Current world summary, settlements and metrics (copies)."""
+        st = self.world.to_dict_summary()
+        st["settlements"] = self.sm.all()
+        st["ticks_run"] = self.t
+        st["metrics"] = dict(self.metrics)
+        return st
+
+    def close(self) -> int:
+        """Finish the run: write summary.json (kept in `self.summary` when
+        headless), close the log, return the score.
+
+        Safe to call more than once, and before all ticks have run.
+        """
+        if self.closed:
+            return self.score  # type: ignore
+        world, sm, metrics = self.world, self.sm, self.metrics
+        final = world.to_dict_summary()
+        final["settlements"] = sm.all()
+        total_pop = sum(s.population for s in sm.settlements.values())
+        score = (total_pop * 10 + sm.count() * 25 + len(world.structures) * 5
+                 + metrics["food_deposited_total"] - metrics["population_starved_events"] * 5)
+        summary = {
+            "run_id": self.run_id, "seed": self.seed, "ticks": self.t, "num_agents": self.num_agents,
+            "final": final, "metrics": metrics, "score": score,
+            "governor": self.gov.to_dict(), "scenario": self.scenario.to_dict(),
+        }
+        if self.run_dir is not None:
+            (self.run_dir / "summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        self.summary = summary
+        self.logger.event({"type": "run_finished", "run_id": self.run_id})
+        self.logger.close()
+        self.closed = True
+        self.score = score
+        return score
+
+    def _tick(self, t: int) -> None:
+        world, sm, logger, rng = self.world, self.sm, self.logger, self.rng
+        scenario, caps = self.scenario, self.caps
         world.tick = t
-        logger.event({"type": "tick_started", "tick": t})
+        if logger.enabled("tick_started"):
+            logger.event({"type": "tick_started", "tick": t})
 
         for ev in scenario.pending_events(t):
             if ev.kind == "drought":
-                drought_active = True
+                self.drought_active = True
             elif ev.kind == "boom":
+                idxs = []
                 for _ in range(40):
                     x, y = rng.randint(0, world.width - 1), rng.randint(0, world.height - 1)
-                    tile = world.tile_at(x, y)
-                    tile.food = min(tile.food + 3, cfg.max_food)
-                    tile.wood = min(tile.wood + 2, cfg.max_wood)
+                    idxs.append(world.idx(x, y))
+                world.tiles.add_clamped(idxs, {"food": 3, "wood": 2}, caps)
             ev.applied = True
             logger.event({"type": "scenario_event", "tick": t, "kind": ev.kind})
 
         if t % 5 == 0:
-            for _ in range(3 if drought_active else 10):
+            idxs = []
+            for _ in range(3 if self.drought_active else 10):
                 x, y = rng.randint(0, world.width - 1), rng.randint(0, world.height - 1)
-                tile = world.tile_at(x, y)
-                tile.food = min(tile.food + 1, cfg.max_food)
-                tile.wood = min(tile.wood + 1, cfg.max_wood)
-                tile.stone = min(tile.stone + 1, cfg.max_stone)
+                idxs.append(world.idx(x, y))
+            world.tiles.add_clamped(idxs, {"food": 1, "wood": 1, "stone": 1}, caps)
 
         for a in world.agents:
-            tile = world.tile_at(a.x, a.y)
-            st = world.structure_at(a.x, a.y)
-            sm.try_deposit(a, tick=t, world=world)
-            nearest_sid = sm.nearest(a.x, a.y)
-            nearest_data = sm.get(nearest_sid) if nearest_sid else None
-
-            obs = Observation(
-                tick=t, self_id=a.agent_id, x=a.x, y=a.y,
-                width=world.width, height=world.height,
-                tile=tile.to_dict(), inventory=a.inv_dict(),
-                structure=(st.to_dict() if st else None),
-                structures=[s.to_dict() for s in world.structures],
-                settlements=sm.all(), nearest_settlement=nearest_data,
-            )
-            action = brains[a.agent_id].act(obs, rng)
-
-            logger.event({"type": "action_attempted", "tick": t, "agent_id": a.agent_id,
-                          "action": action.to_dict(), "pos": {"x": a.x, "y": a.y},
-                          "tile": tile.to_dict(), "inv": a.inv_dict(),
-                          "structure": (st.to_dict() if st else None)})
-
-            ok, note = True, ""
-
-            if action.type == "move":
-                nx, ny = a.x + int(action.dx), a.y + int(action.dy)
-                if nx < 0 or nx >= world.width or ny < 0 or ny >= world.height:
-                    ok, note, nx, ny = False, "out_of_bounds", a.x, a.y
-                a.x, a.y = nx, ny
-
-            elif action.type == "gather":
-                res = action.resource
-                if res not in ("food", "wood", "stone"):
-                    ok, note = False, "bad_resource"
+            self._agent_turn(a, t)
+
+        sm.tick(world, tick=t)
+
+        if self.snapshot_every > 0 and (t % self.snapshot_every) == 0:
+            if logger.enabled("snapshot"):
+                snap = world.to_dict_summary()
+                snap["settlements"] = sm.all()
+                if "structures" in snap:
+                    snap["structures"] = [
+                        {**st3, "settlement_id": sm.structure_settlement_id(st3["x"], st3["y"])}
+                        for st3 in snap["structures"]
+                    ]
+                logger.snapshot({"type": "snapshot", **snap})
+            if logger.enabled("snapshot_saved"):
+                logger.event({"type": "snapshot_saved", "tick": t})
+
+    def _agent_turn(self, a, t: int) -> None:
+        world, sm, logger, rng, gates = self.world, self.sm, self.logger, self.rng, self.gates
+        obs_radius = self.obs_radius
+        tile = world.tile_at(a.x, a.y)
+        st = world.structure_at(a.x, a.y)
+        sm.try_deposit(a, tick=t, world=world)
+        nearest_sid = sm.nearest(a.x, a.y)
+        nearest_data = sm.observed(nearest_sid) if nearest_sid else None
+
+        if obs_radius is None:
+            seen_structures, seen_settlements, nearest_counts = world.structures.snapshot(), sm.snapshot(), None
+        else:
+            seen_structures = world.structures.near(a.x, a.y, obs_radius)
+            seen_settlements = sm.near(a.x, a.y, obs_radius)
+            nearest_counts = sm.observed_counts(nearest_sid) if nearest_sid else {}
+        obs = Observation(
+            tick=t, self_id=a.agent_id, x=a.x, y=a.y,
+            width=world.width, height=world.height,
+            tile=tile.to_dict(), inventory=a.inv_dict(),
+            structure=(st.to_dict() if st else None),
+            structures=seen_structures,
+            settlements=seen_settlements, nearest_settlement=nearest_data,
+            nearest_counts=nearest_counts,
+            build_mask=gates.mask(nearest_sid, sm, world) if self.mask_builds else None,
+        )
+        action = self.brains[a.agent_id].act(obs, rng)
+
+        if logger.enabled("action_attempted"):
+            logger.event_fields("action_attempted", t, a.agent_id, action.to_json(), a.x, a.y,
+                                tile.food, tile.wood, tile.stone, a.inv_food, a.inv_wood, a.inv_stone, st)
+
+        ok, note = self._resolve_action(a, action, t)
+
+        resolved = logger.level("action_resolved")
+        if resolved == "on" or (resolved == "builds" and note.startswith("built_")):
+            tile2 = world.tile_at(a.x, a.y)
+            st2 = world.structure_at(a.x, a.y)
+            sid2 = sm.structure_settlement_id(st2.x, st2.y) if st2 else None
+            logger.event_fields("action_resolved", t, a.agent_id, ok, note, a.x, a.y,
+                                tile2.food, tile2.wood, tile2.stone, a.inv_food, a.inv_wood, a.inv_stone, st2, sid2)
+
+    def _resolve_action(self, a, action, t: int) -> Tuple[bool, str]:
+        world, sm, logger, gates = self.world, self.sm, self.logger, self.gates
+        metrics, rules = self.metrics, self.rules
+        ok, note = True, ""
+
+        if action.type == "move":
+            nx, ny = a.x + int(action.dx), a.y + int(action.dy)
+            if nx < 0 or nx >= world.width or ny < 0 or ny >= world.height:
+                ok, note, nx, ny = False, "out_of_bounds", a.x, a.y
+            a.x, a.y = nx, ny
+
+        elif action.type == "gather":
+            res = action.resource
+            if res not in ("food", "wood", "stone"):
+                ok, note = False, "bad_resource"
+            else:
+                cur = world.tile_at(a.x, a.y)
+                attr = {"food": "inv_food", "wood": "inv_wood", "stone": "inv_stone"}[res]
+                if getattr(cur, res) >= 1:
+                    setattr(cur, res, getattr(cur, res) - 1)
+                    setattr(a, attr, getattr(a, attr) + 1)
+                    try:
+                        nearest_sid = sm.nearest(a.x, a.y)
+                        if nearest_sid is not None and sm.settlement_has_workshop(nearest_sid, world):
+                            s = sm.get(nearest_sid)
+                            tools = s.tools_stock
+                            consume = rules.tools_consume_per_boost
+                            if tools >= 1.0:
+                                setattr(a, attr, getattr(a, attr) + 1)
+                                s.tools_stock = tools - consume
+                                sm.mark_changed()
+                                metrics["tools_boost_events"] = metrics.get("tools_boost_events", 0) + 1
+                                note = "tools_boost"
+                    except Exception:
+                        pass
                 else:
-                    cur = world.tile_at(a.x, a.y)
-                    attr = {"food": "inv_food", "wood": "inv_wood", "stone": "inv_stone"}[res]
-                    if getattr(cur, res) >= 1:
-                        setattr(cur, res, getattr(cur, res) - 1)
-                        setattr(a, attr, getattr(a, attr) + 1)
-                        try:
-                            nearest_sid = sm.nearest(a.x, a.y)
-                            if nearest_sid is not None and sm.settlement_has_workshop(nearest_sid, world):
-                                s = sm.get(nearest_sid)
-                                tools = float(s.get("tools_stock", 0.0))
-                                consume = float(SETTLEMENT_RULES.get("tools_consume_per_boost", 0.5))
-                                if tools >= 1.0:
-                                    setattr(a, attr, getattr(a, attr) + 1)
-                                    s["tools_stock"] = tools - consume
-                                    metrics["tools_boost_events"] = metrics.get("tools_boost_events", 0) + 1
-                                    note = "tools_boost"
-                        except Exception:
-                            pass
+                    ok, note = False, f"no_{res}"
+
+        elif action.type == "build":
+            b, gov_note = gates.resolve(action.building, a.x, a.y, sm, world)
+            if gov_note:
+                note = gov_note
+
+            allowed, gate_note = gates.can_build(b, a.x, a.y, sm, world)
+            if not allowed:
+                ok, note = False, gate_note
+
+            if ok and b not in BUILD_COSTS:
+                ok, note = False, "bad_building"
+            elif ok and world.structure_at(a.x, a.y) is not None:
+                existing = world.structure_at(a.x, a.y)
+                soft = ("road", "hut", "farm", "walls")
+                overwritable = ("library", "temple", "academy", "lab", "observatory", "market")
+                if existing and not (b in overwritable and existing.type in soft):
+                    if b not in STACKABLE or existing.type == b or b in overwritable:
+                        ok, note = False, "occupied"
+
+            if ok:
+                cost = BUILD_COSTS[b]
+                need_wood, need_stone = int(cost["wood"]), int(cost["stone"])
+                cur = world.tile_at(a.x, a.y)
+                use_wood = use_stone = 0
+
+                use_wood = min(a.inv_wood, need_wood)
+                use_stone = min(a.inv_stone, need_stone)
+                a.inv_wood -= use_wood
+                a.inv_stone -= use_stone
+                need_wood -= use_wood
+                need_stone -= use_stone
+                if need_wood > 0 and cur.wood > 0:
+                    take = min(int(cur.wood), need_wood)
+                    cur.wood -= take
+                    need_wood -= take
+                if need_stone > 0 and cur.stone > 0:
+                    take = min(int(cur.stone), need_stone)
+                    cur.stone -= take
+                    need_stone -= take
+
+                if (need_wood > 0 or need_stone > 0) and sm.count() == 0:
+                    ok, note = False, "insufficient_resources"
+                    a.inv_wood += use_wood
+                    a.inv_stone += use_stone
+
+                funded_sid = None
+                if (need_wood > 0 or need_stone > 0) and sm.count() > 0:
+                    best_sid = sm.nearest(a.x, a.y)
+                    funded_sid = best_sid
+                    s = sm.get(best_sid)  # type: ignore
+                    if s.wood_stock >= need_wood and s.stone_stock >= need_stone:
+                        s.wood_stock -= need_wood
+                        s.stone_stock -= need_stone
+                        sm.mark_changed()
+                        need_wood = need_stone = 0
                     else:
-                        ok, note = False, f"no_{res}"
-
-            elif action.type == "build":
-                b, gov_note = resolve_building(action.building, a.x, a.y, sm, world)
-                if gov_note:
-                    note = gov_note
-
-                if b == "hut":
-                    allowed, gate_note = can_build_hut(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "granary":
-                    allowed, gate_note = can_build_granary(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "mine":
-                    allowed, gate_note = can_build_mine(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "road":
-                    allowed, gate_note = can_build_road(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "workshop":
-                    allowed, gate_note = can_build_workshop(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "barracks":
-                    allowed, gate_note = can_build_barracks(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "market":
-                    allowed, gate_note = can_build_market(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "temple":
-                    allowed, gate_note = can_build_temple(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "academy":
-                    allowed, gate_note = can_build_academy(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "walls":
-                    allowed, gate_note = can_build_walls(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "irrigation":
-                    allowed, gate_note = can_build_irrigation(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "library":
-                    allowed, gate_note = can_build_library(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "foundry":
-                    allowed, gate_note = can_build_foundry(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "hall":
-                    allowed, gate_note = can_build_hall(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "command":
-                    allowed, gate_note = can_build_command(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "lab":
-                    allowed, gate_note = can_build_lab(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-                elif b == "observatory":
-                    allowed, gate_note = can_build_observatory(a.x, a.y, sm, world)
-                    if not allowed: ok, note = False, gate_note
-
-                if ok and b not in BUILD_COSTS:
-                    ok, note = False, "bad_building"
-                elif ok and world.structure_at(a.x, a.y) is not None:
-                    existing = world.structure_at(a.x, a.y)
-                    soft = ("road", "hut", "farm", "walls")
-                    overwritable = ("library", "temple", "academy", "lab", "observatory", "market")
-                    if existing and not (b in overwritable and existing.type in soft):
-                        if b not in STACKABLE or existing.type == b or b in overwritable:
-                            ok, note = False, "occupied"
-
-                if ok:
-                    cost = BUILD_COSTS[b]
-                    need_wood, need_stone = int(cost["wood"]), int(cost["stone"])
-                    cur = world.tile_at(a.x, a.y)
-                    use_wood = use_stone = 0
-
-                    use_wood = min(a.inv_wood, need_wood)
-                    use_stone = min(a.inv_stone, need_stone)
-                    a.inv_wood -= use_wood
-                    a.inv_stone -= use_stone
-                    need_wood -= use_wood
-                    need_stone -= use_stone
-                    if need_wood > 0 and cur.wood > 0:
-                        take = min(int(cur.wood), need_wood)
-                        cur.wood -= take
-                        need_wood -= take
-                    if need_stone > 0 and cur.stone > 0:
-                        take = min(int(cur.stone), need_stone)
-                        cur.stone -= take
-                        need_stone -= take
-
-                    if (need_wood > 0 or need_stone > 0) and sm.count() == 0:
                         ok, note = False, "insufficient_resources"
                         a.inv_wood += use_wood
                         a.inv_stone += use_stone
 
-                    funded_sid = None
-                    if (need_wood > 0 or need_stone > 0) and sm.count() > 0:
-                        best_sid = sm.nearest(a.x, a.y)
-                        funded_sid = best_sid
-                        s = sm.get(best_sid)  # type: ignore
-                        if s["wood_stock"] >= need_wood and s["stone_stock"] >= need_stone:
-                            s["wood_stock"] -= need_wood
-                            s["stone_stock"] -= need_stone
-                            need_wood = need_stone = 0
-                        else:
-                            ok, note = False, "insufficient_resources"
-                            a.inv_wood += use_wood
-                            a.inv_stone += use_stone
-
-                    if ok and need_wood == 0 and need_stone == 0:
-                        existing = world.structure_at(a.x, a.y)
-                        if existing is None:
-                            world.structures.append(Structure(type=b, x=a.x, y=a.y, owner_id=a.agent_id))
-                            note = f"built_{b}"
-                            metrics_key = f"build_{b}"
-                            if metrics_key in metrics:
-                                metrics[metrics_key] += 1
-                            if funded_sid is not None:
-                                logger.event({"type": "build_funded", "tick": t, "agent_id": a.agent_id,
-                                              "settlement_id": funded_sid, "building": b})
-                            sm.link_structure(a.x, a.y, owner_id=a.agent_id, world=world, tick=t)
-                        elif b in ("library", "temple", "academy", "lab", "observatory", "market") and existing.type in ("road", "hut", "farm", "walls"):
-                            existing.type = b
-                            existing.owner_id = a.agent_id
-                            note = f"built_{b}"
-                            metrics[f"build_{b}"] = metrics.get(f"build_{b}", 0) + 1
-                            if funded_sid is not None:
-                                logger.event({"type": "build_funded", "tick": t, "agent_id": a.agent_id,
-                                              "settlement_id": funded_sid, "building": b})
-                            sm.link_structure(a.x, a.y, owner_id=a.agent_id, world=world, tick=t)
-                        else:
-                            ok, note = False, "occupied"
-            else:
-                ok, note = False, "unknown_action"
+                if ok and need_wood == 0 and need_stone == 0:
+                    existing = world.structure_at(a.x, a.y)
+                    if existing is None:
+                        world.add_structure(b, a.x, a.y, a.agent_id)
+                        note = f"built_{b}"
+                        metrics_key = f"build_{b}"
+                        if metrics_key in metrics:
+                            metrics[metrics_key] += 1
+                        if funded_sid is not None:
+                            logger.event({"type": "build_funded", "tick": t, "agent_id": a.agent_id,
+                                          "settlement_id": funded_sid, "building": b})
+                        sm.link_structure(a.x, a.y, owner_id=a.agent_id, world=world, tick=t)
+                    elif b in ("library", "temple", "academy", "lab", "observatory", "market") and existing.type in ("road", "hut", "farm", "walls"):
+                        existing.type = b
+                        existing.owner_id = a.agent_id
+                        note = f"built_{b}"
+                        metrics[f"build_{b}"] = metrics.get(f"build_{b}", 0) + 1
+                        if funded_sid is not None:
+                            logger.event({"type": "build_funded", "tick": t, "agent_id": a.agent_id,
+                                          "settlement_id": funded_sid, "building": b})
+                        sm.link_structure(a.x, a.y, owner_id=a.agent_id, world=world, tick=t)
+                    else:
+                        ok, note = False, "occupied"
+        else:
+            ok, note = False, "unknown_action"
 
-            tile2 = world.tile_at(a.x, a.y)
-            st2 = world.structure_at(a.x, a.y)
-            sid2 = sm.structure_settlement_id(st2.x, st2.y) if st2 else None
-            logger.event({"type": "action_resolved", "tick": t, "agent_id": a.agent_id, "ok": ok, "note": note,
-                          "pos": {"x": a.x, "y": a.y}, "tile": tile2.to_dict(), "inv": a.inv_dict(),
-                          "structure": (st2.to_dict() if st2 else None), "settlement_id": sid2})
+        return ok, note
 
-        sm.tick(world, tick=t)
 
-        if snapshot_every > 0 and (t % snapshot_every) == 0:
-            snap = world.to_dict_summary()
-            snap["settlements"] = sm.all()
-            if "structures" in snap:
-                snap["structures"] = [
-                    {**st3, "settlement_id": sm.structure_settlement_id(st3["x"], st3["y"])}
-                    for st3 in snap["structures"]
-                ]
-            logger.snapshot({"type": "snapshot", **snap})
-            logger.event({"type": "snapshot_saved", "tick": t})
-
-    final = world.to_dict_summary()
-    final["settlements"] = sm.all()
-    total_pop = sum(int(s["population"]) for s in sm.all()) if sm.count() else 0
-    score = (total_pop * 10 + sm.count() * 25 + len(world.structures) * 5
-             + metrics["food_deposited_total"] - metrics["population_starved_events"] * 5)
-    summary = {
-        "run_id": run_id, "seed": seed, "ticks": ticks, "num_agents": num_agents,
-        "final": final, "metrics": metrics, "score": score,
-        "governor": gov.to_dict(), "scenario": scenario.to_dict(),
-    }
-    (run_dir / "summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
-    logger.event({"type": "run_finished", "run_id": run_id})
-    logger.close()
-    print(f"Run complete: {run_id}")
-    print(f"Outputs in: {run_dir}")
+def run_sim(
+    seed: int, ticks: int, snapshot_every: int,
+    agent_kind: str = "utility", policy_weights: dict = None, return_score: bool = False,
+    governor_command: Optional[str] = None, scenario_commands: Optional[str] = None,
+    control_agent_id: Optional[str] = None, control_policy: str = "idle", num_agents: int = 4,
+    quiet: bool = False, settlement_rules: Optional[Dict[str, Any]] = None,
+    obs_radius: Optional[int] = None, mask_builds: bool = False,
+    headless: bool = False, return_state: bool = False, checkpoint_every: int = 0,
+    log_level: Optional[str] = None, log_overrides: Optional[Dict[str, str]] = None,
+    async_log: bool = False, log_queue_size: int = 64, flush_every: int = 1000, flush_ms: float = 250.0,
+    event_format: str = "jsonl", segment_ticks: int = 0, compression: Optional[str] = None,
+):
+    """Run a whole simulation.
+
+    Normally writes runs/<id>/ and returns (score, run_id) when return_score
+    is set. With headless=True nothing touches the disk and a RunResult
+    (summary, metrics and, with return_state, the final state) is returned.
+    """
+    sim = Simulation(
+        seed, ticks, snapshot_every, agent_kind=agent_kind, policy_weights=policy_weights,
+        governor_command=governor_command, scenario_commands=scenario_commands,
+        control_agent_id=control_agent_id, control_policy=control_policy, num_agents=num_agents,
+        quiet=quiet, settlement_rules=settlement_rules, obs_radius=obs_radius, mask_builds=mask_builds,
+        headless=headless, checkpoint_every=checkpoint_every,
+        log_level=log_level, log_overrides=log_overrides,
+        async_log=async_log, log_queue_size=log_queue_size, flush_every=flush_every, flush_ms=flush_ms,
+        event_format=event_format, segment_ticks=segment_ticks, compression=compression,
+    )
+    sim.run_until(sim.ticks)
+    score = sim.close()
+    if headless:
+        return RunResult(sim.run_id, score, sim.summary, sim.state() if return_state else None)  # type: ignore[arg-type]
+    print(f"Run complete: {sim.run_id}")
+    print(f"Outputs in: {sim.run_dir}")
+    if return_score:
+        return score, sim.run_id
+    return None
+
+
+def resume_sim(path: Union[str, Path], ticks: Optional[int] = None, return_score: bool = False):
+    """Resume a checkpointed run (see `Simulation.resume`) and finish it."""
+    sim = Simulation.resume(path, ticks=ticks)
+    print(f"Resuming {sim.run_id} at tick {sim.t}")
+    sim.run_until(sim.ticks)
+    score = sim.close()
+    print(f"Run complete: {sim.run_id}")
+    print(f"Outputs in: {sim.run_dir}")
     if return_score:
-        return score, run_id
+        return score, sim.run_id
     return None
@@ -0,0 +1,367 @@
+"""Compact binary event log (events.bin) and readers for both log formats.
+
+A file is MAGIC followed by records, each starting with a little-endian
+uint16 id:
+
+  0  string definition   uint32 length + UTF-8 bytes; ids count up from 0
+  1  schema definition   uint32 length + JSON {"fields": [...]}; ids count up from 2
+  2+ event               the schema's struct-packed fields, then any JSON blobs
+
+A schema is the exact shape of one kind of event: its keys in order, the
+event type as a constant, nested dicts flattened, and per field one code:
+
+  n None (no bytes)   t bool "?"   i int32 "i"   q int64 "q"   d float "d"
+  s interned string (uint32 id)    J anything else, as a JSON blob (uint32 length)
+
+Events decode to the same dicts `json.loads` gives for the JSONL line, so
+`binary_to_jsonl()` reproduces the original file byte for byte.
+
+The readers also follow segmented runs (manifest.json, see sim.log.sinks)
+and open .gz / .xz segments transparently.
+"""
+import io
+import json
+import struct
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from sim.log.sinks import COMPRESSIONS, MANIFEST_NAME
+
+MAGIC = b"AIWEVT1\n"
+STRING_DEF, SCHEMA_DEF, FIRST_SCHEMA = 0, 1, 2
+
+_I32 = (-2 ** 31, 2 ** 31 - 1)
+_I64 = (-2 ** 63, 2 ** 63 - 1)
+_STRUCT = {"t": "?", "i": "i", "q": "q", "d": "d", "s": "I", "J": "I"}
+_ID = struct.Struct("<H")
+_DEF = struct.Struct("<HI")
+_LEN = struct.Struct("<I")
+
+PathLike = Union[str, Path]
+
+
+def _code(v: Any) -> Any:
+    t = type(v)
+    if v is None:
+        return "n"
+    if t is bool:
+        return "t"
+    if t is int:
+        if _I32[0] <= v <= _I32[1]:
+            return "i"
+        return "q" if _I64[0] <= v <= _I64[1] else "J"
+    if t is float:
+        return "d"
+    if t is str:
+        return "s"
+    if t is dict and all(type(k) is str for k in v):
+        return ("D", tuple((k, _code(x)) for k, x in v.items()))
+    return "J"
+
+
+def _signature(obj: Dict[str, Any]) -> Tuple:
+    return tuple((k, ("c", x) if k == "type" and type(x) is str else _code(x)) for k, x in obj.items())
+
+
+def _to_json(sig: Tuple) -> List:
+    return [[k, list(c) if c[0] == "c" else ["D", _to_json(c[1])] if c[0] == "D" else c] for k, c in sig]
+
+
+def _from_json(fields: List) -> Tuple:
+    return tuple((k, c if isinstance(c, str) else ("c", c[1]) if c[0] == "c" else ("D", _from_json(c[1])))
+                 for k, c in fields)
+
+
+class _Schema:
+    """Struct layout for one signature, with generated match / encode
+    functions (writing, given `intern`) or a build function (reading, given
+    the `strings` table)."""
+    __slots__ = ("sid", "sig", "struct", "size", "blobs", "encode", "match", "build")
+
+    def __init__(self, sid: int, sig: Tuple, strings: Optional[List[str]] = None,
+                 intern: Optional[Callable[[str], int]] = None):
+        self.sid, self.sig = sid, sig
+        fmt, packed, checks, blobs, pre = ["<"], [], [], [], []
+        counter = [0]
+
+        def walk(sig: Tuple, expr: str, top: bool) -> str:
+            checks.append(f"tuple({expr}) == {tuple(k for k, _ in sig)!r}" if top else
+                          f"type({expr}) is dict and tuple({expr}) == {tuple(k for k, _ in sig)!r}")
+            parts = []
+            for k, c in sig:
+                e = f"{expr}[{k!r}]"
+                if c == "n":
+                    checks.append(f"{e} is None")
+                    val = "None"
+                elif c[0] == "c":
+                    checks.append(f"{e} == {c[1]!r}")
+                    val = repr(c[1])
+                elif c[0] == "D":
+                    val = walk(c[1], e, False)
+                else:
+                    i = counter[0]
+                    counter[0] += 1
+                    fmt.append(_STRUCT[c])
+                    if c == "t":
+                        checks.append(f"type({e}) is bool")
+                    elif c in ("i", "q"):
+                        lo, hi = _I32 if c == "i" else _I64
+                        checks.append(f"type({e}) is int and {lo} <= {e} <= {hi}")
+                    elif c == "d":
+                        checks.append(f"type({e}) is float")
+                    elif c == "s":
+                        checks.append(f"type({e}) is str")
+                    if c == "s":
+                        packed.append(f"_intern({e})")
+                        val = f"S[v[{i}]]"
+                    elif c == "J":
+                        j = len(blobs)
+                        pre.append(f"    j{j} = _dumps({e}).encode()")
+                        packed.append(f"len(j{j})")
+                        blobs.append(i)
+                        val = f"_loads(b[{j}])"
+                    else:
+                        packed.append(e)
+                        val = f"v[{i}]"
+                parts.append(f"{k!r}: {val}")
+            return "{" + ", ".join(parts) + "}"
+
+        tree = walk(sig, "o", True)
+        self.struct = struct.Struct("".join(fmt))
+        self.size = self.struct.size
+        self.blobs = tuple(blobs)
+        ns: Dict[str, Any] = {"_pack": self.struct.pack, "_intern": intern, "_dumps": json.dumps,
+                              "_loads": json.loads, "S": strings}
+        # writers need match/encode, readers only build
+        if intern is not None:
+            tail = "".join(f" + j{j}" for j in range(len(blobs)))
+            src = (f"def match(o):\n    return {' and '.join(checks)}\n"
+                   f"def encode(o):\n" + "".join(p + "\n" for p in pre)
+                   + f"    return _pack({', '.join(packed)}){tail}\n")
+        else:
+            src = f"def build(v, b):\n    return {tree}\n"
+        exec(compile(src, f"<event schema {sid}>", "exec"), ns)
+        self.encode, self.match, self.build = ns.get("encode"), ns.get("match"), ns.get("build")
+
+
+class BinaryEventEncoder:
+    """Turns event dicts into events.bin bytes; string and schema
+    definitions are emitted in front of the first event that needs them."""
+
+    def __init__(self):
+        self._strings: Dict[str, int] = {}
+        self._schemas: Dict[Tuple, _Schema] = {}
+        self._last: Dict[Any, _Schema] = {}  # event type -> schema it used last
+        self._out: List[bytes] = []
+
+    def header(self) -> bytes:
+        return MAGIC
+
+    def _intern(self, s: str) -> int:
+        i = self._strings.get(s)
+        if i is None:
+            i = self._strings[s] = len(self._strings)
+            raw = s.encode("utf-8")
+            self._out.append(_DEF.pack(STRING_DEF, len(raw)) + raw)
+        return i
+
+    def _define(self, sig: Tuple, emit: bool = True) -> _Schema:
+        sid = FIRST_SCHEMA + len(self._schemas)
+        if sid > 0xFFFF:
+            raise ValueError("too many event schemas for one binary log")
+        sch = self._schemas[sig] = _Schema(sid, sig, intern=self._intern)
+        if emit:
+            raw = json.dumps({"fields": _to_json(sig)}).encode("utf-8")
+            self._out.append(_DEF.pack(SCHEMA_DEF, len(raw)) + raw)
+        return sch
+
+    def encode(self, obj: Dict[str, Any]) -> bytes:
+        etype = obj.get("type")
+        sch = self._last.get(etype)
+        if sch is None or not sch.match(obj):
+            sig = _signature(obj)
+            sch = self._schemas.get(sig) or self._define(sig)
+            self._last[etype] = sch
+        rec = _ID.pack(sch.sid) + sch.encode(obj)
+        if self._out:
+            rec = b"".join(self._out) + rec
+            self._out = []
+        return rec
+
+    def resume(self, path: PathLike) -> None:
+        """Pick up the string and schema tables of an existing events.bin,
+        so new events can be appended to it."""
+        for kind, value in _records(path):
+            if kind == STRING_DEF:
+                self._strings[value] = len(self._strings)
+            elif kind == SCHEMA_DEF:
+                self._define(value, emit=False)
+
+
+def _open_log(path: PathLike) -> IO[bytes]:
+    """Open a log file for reading, decompressing .gz / .xz files."""
+    path = Path(path)
+    for suffix, opener in COMPRESSIONS.values():
+        if path.name.endswith(suffix):
+            return opener(path, "rb")
+    return open(path, "rb")
+
+
+def _records(path: PathLike, chunk: int = 1 << 20) -> Iterator[Tuple[int, Any]]:
+    """Yield (STRING_DEF, str), (SCHEMA_DEF, signature) and (FIRST_SCHEMA, event dict)."""
+    strings: List[str] = []
+    schemas: List[_Schema] = []
+    with _open_log(path) as f:
+        buf = f.read(max(chunk, len(MAGIC)))
+        if not buf.startswith(MAGIC):
+            raise ValueError(f"{path}: not a binary event log")
+        off = len(MAGIC)
+
+        def refill(buf: bytes, off: int, need: int) -> bytes:
+            # returns buf[off:] extended to at least `need` bytes
+            more = f.read(max(chunk, need - (len(buf) - off)))
+            if not more:
+                raise ValueError(f"{path}: truncated record")
+            return buf[off:] + more
+
+        while True:
+            if off + 2 > len(buf):
+                rest = buf[off:]
+                buf, off = rest + f.read(chunk), 0
+                if not buf:
+                    return
+                if len(buf) == len(rest):
+                    raise ValueError(f"{path}: truncated record")
+                continue
+            sid, = _ID.unpack_from(buf, off)
+            if sid < FIRST_SCHEMA:
+                if off + _DEF.size > len(buf):
+                    buf, off = refill(buf, off, _DEF.size), 0
+                    continue
+                length, = _LEN.unpack_from(buf, off + 2)
+                end = off + _DEF.size + length
+                if end > len(buf):
+                    buf, off = refill(buf, off, end - off), 0
+                    continue
+                raw = buf[off + _DEF.size:end]
+                off = end
+                if sid == STRING_DEF:
+                    s = raw.decode("utf-8")
+                    strings.append(s)
+                    yield STRING_DEF, s
+                else:
+                    sig = _from_json(json.loads(raw)["fields"])
+                    schemas.append(_Schema(FIRST_SCHEMA + len(schemas), sig, strings=strings))
+                    yield SCHEMA_DEF, sig
+                continue
+            sch = schemas[sid - FIRST_SCHEMA]
+            end = off + 2 + sch.size
+            if end > len(buf):
+                buf, off = refill(buf, off, end - off), 0
+                continue
+            v = sch.struct.unpack_from(buf, off + 2)
+            if sch.blobs:
+                total = end + sum(v[i] for i in sch.blobs)
+                if total > len(buf):
+                    buf, off = refill(buf, off, total - off), 0
+                    continue
+                blobs = []
+                for i in sch.blobs:
+                    blobs.append(buf[end:end + v[i]])
+                    end += v[i]
+                yield FIRST_SCHEMA, sch.build(v, blobs)
+            else:
+                yield FIRST_SCHEMA, sch.build(v, ())
+            off = end
+
+
+def read_binary_events(path: PathLike) -> Iterator[Dict[str, Any]]:
+    """Stream the events of an events.bin file."""
+    for kind, value in _records(path):
+        if kind >= FIRST_SCHEMA:
+            yield value
+
+
+def read_jsonl_events(path: PathLike) -> Iterator[Dict[str, Any]]:
+    with io.TextIOWrapper(_open_log(path), encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _read_file(path: Path) -> Iterator[Dict[str, Any]]:
+    with _open_log(path) as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return read_binary_events(path) if binary else read_jsonl_events(path)
+
+
+def _segment_path(run_dir: Path, name: str) -> Path:
+    # the compressor may have swapped the file since the manifest was read
+    path = run_dir / name
+    if not path.exists():
+        for suffix, _ in COMPRESSIONS.values():
+            if (run_dir / (name + suffix)).exists():
+                return run_dir / (name + suffix)
+    return path
+
+
+def read_stream(run_dir: PathLike, stream: str = "events", first_tick: Optional[int] = None,
+                last_tick: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Stream "events" or "snapshots" records of a run directory.
+
+    For segmented runs only the segments overlapping [first_tick, last_tick]
+    are opened; records are not filtered further, so callers still check the
+    tick themselves. Unsegmented runs read the single file whole.
+    """
+    run_dir = Path(run_dir)
+    manifest = run_dir / MANIFEST_NAME
+    if not manifest.exists():
+        if stream == "events" and (run_dir / "events.bin").exists():
+            yield from read_binary_events(run_dir / "events.bin")
+        else:
+            yield from read_jsonl_events(run_dir / f"{stream}.jsonl")
+        return
+    segments = json.loads(manifest.read_text(encoding="utf-8"))["streams"].get(stream, [])
+    for seg in segments:
+        if first_tick is not None and seg["last_tick"] < first_tick:
+            continue
+        if last_tick is not None and seg["first_tick"] > last_tick:
+            break
+        yield from _read_file(_segment_path(run_dir, seg["file"]))
+
+
+def read_events(path: PathLike) -> Iterator[Dict[str, Any]]:
+    """Stream events from an events.bin / events.jsonl file (possibly
+    compressed), or from a run directory."""
+    path = Path(path)
+    if path.is_dir():
+        return read_stream(path, "events")
+    return _read_file(path)
+
+
+def read_snapshots(run_dir: PathLike, first_tick: Optional[int] = None,
+                   last_tick: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    return read_stream(run_dir, "snapshots", first_tick, last_tick)
+
+
+def jsonl_to_binary(src: PathLike, dst: PathLike) -> int:
+    """Convert events.jsonl to events.bin; returns the number of events."""
+    enc = BinaryEventEncoder()
+    n = 0
+    with open(dst, "wb") as out:
+        out.write(enc.header())
+        for ev in read_jsonl_events(src):
+            out.write(enc.encode(ev))
+            n += 1
+    return n
+
+
+def binary_to_jsonl(src: PathLike, dst: PathLike) -> int:
+    """Convert events.bin back to events.jsonl; returns the number of events."""
+    n = 0
+    with open(dst, "w", encoding="utf-8") as out:
+        for ev in read_binary_events(src):
+            out.write(json.dumps(ev) + "\n")
+            n += 1
+    return n
@@ -0,0 +1,127 @@
+"""Precompiled JSONL encoders for the high-volume, fixed-shape event types.
+
+EVENT_SCHEMAS lists each event's keys in logged order (after "type") with
+one code per field. `EventSchema` compiles that into `encode(*fields)`,
+which returns exactly the bytes of `json.dumps(event) + "\\n"` without
+building the event dict, and `to_dict(*fields)` for consumers that need
+the dict (the binary format). Fields are passed flat and positionally:
+
+  i  int            n  int or float      t  bool
+  s  str            s? str or None       R  pre-encoded JSON text
+  *R pre-encoded `"key": value, ...` pairs, spliced into the parent
+  [...]             nested object, one argument per field ("pos_x", "pos_y")
+  ("?", [...])      object or None, one argument; fields are read from the
+                    attribute named third in each entry
+"""
+import json
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+_RESOURCES = [("food", "i"), ("wood", "i"), ("stone", "i")]
+_POS = [("x", "i"), ("y", "i")]
+_STRUCTURE = ("?", [("type", "s", "type"), ("x", "i", "x"), ("y", "i", "y"), ("owner", "s?", "owner_id")])
+
+EVENT_SCHEMAS: Dict[str, List[Tuple[str, Any]]] = {
+    "action_attempted": [
+        ("tick", "i"), ("agent_id", "s"), ("action", "R"), ("pos", _POS),
+        ("tile", _RESOURCES), ("inv", _RESOURCES), ("structure", _STRUCTURE),
+    ],
+    "action_resolved": [
+        ("tick", "i"), ("agent_id", "s"), ("ok", "t"), ("note", "s"), ("pos", _POS),
+        ("tile", _RESOURCES), ("inv", _RESOURCES), ("structure", _STRUCTURE), ("settlement_id", "s?"),
+    ],
+    "population_changed": [
+        ("tick", "i"), ("settlement_id", "s"), ("population_before", "i"), ("population_after", "i"),
+        ("food_before", "n"), ("food_after", "n"), ("farm_yield", "n"), ("granary_bonus", "n"),
+        ("need", "n"), ("flags", "*R"), ("subjects", "R"), ("era", "i"),
+    ],
+}
+
+_INF = float("inf")
+
+
+def _special(v: float) -> str:
+    # how json.dumps writes the floats repr() gets "wrong"
+    return "NaN" if v != v else "Infinity" if v > 0 else "-Infinity"
+
+
+def _splice(raw: str) -> Dict[str, Any]:
+    return json.loads("{" + raw + "}") if raw else {}
+
+
+class EventSchema:
+    """Generated encode / to_dict functions for one EVENT_SCHEMAS entry.
+    `index` maps top-level keys to argument positions."""
+    __slots__ = ("etype", "args", "index", "encode", "to_dict")
+
+    def __init__(self, etype: str, fields: Sequence[Tuple[str, Any]]):
+        self.etype = etype
+        args: List[str] = []
+        helpers: List[str] = []
+
+        def leaf(code: str, v: str) -> Tuple[str, str]:
+            # (text expression, dict expression)
+            if code == "i":
+                return f"{{{v}!r}}", v
+            if code == "n":
+                return f"{{_repr({v}) if {v}.__class__ is int or -_INF < {v} < _INF else _special({v})}}", v
+            if code == "t":
+                return f"{{'true' if {v} else 'false'}}", v
+            if code == "s":
+                return f"{{_str({v})}}", v
+            if code == "s?":
+                return f"{{'null' if {v} is None else _str({v})}}", v
+            if code == "R":
+                return f"{{{v}}}", f"_loads({v})"
+            raise ValueError(f"{etype}: unknown field code {code!r}")
+
+        def group(entries, prefix: str, obj: str = "") -> Tuple[str, str]:
+            text, items = [], []
+            for entry in entries:
+                key, code = entry[0], entry[1]
+                name = prefix + key
+                if obj:
+                    t, d = leaf(code, f"{obj}.{entry[2]}")
+                elif isinstance(code, list):
+                    t, d = group(code, name + "_")
+                elif isinstance(code, tuple) and code[0] == "=":
+                    t, d = json.dumps(code[1]), repr(code[1])
+                elif isinstance(code, tuple):
+                    args.append(name)
+                    t, d = group(code[1], "", "o")
+                    h = len(helpers)
+                    helpers.append(f"def _g{h}(o):\n    return f'''{t}'''\n"
+                                   f"def _d{h}(o):\n    return {d}\n")
+                    t, d = f"{{'null' if {name} is None else _g{h}({name})}}", f"None if {name} is None else _d{h}({name})"
+                elif code == "*R":
+                    args.append(name)
+                    text.append(f"{{{name}}}")
+                    items.append(f"**_splice({name})")
+                    continue
+                else:
+                    args.append(name)
+                    t, d = leaf(code, name)
+                text.append(f"{json.dumps(key)}: {t}")
+                items.append(f"{key!r}: {d}")
+            return "{{" + ", ".join(text) + "}}", "{" + ", ".join(items) + "}"
+
+        text, items = group([("type", ("=", etype))] + list(fields), "")
+        sig = ", ".join(args)
+        src = ("".join(helpers)
+               + f"def encode({sig}):\n    return f'''{text}\\n'''.encode()\n"
+               + f"def to_dict({sig}):\n    return {items}\n")
+        ns: Dict[str, Any] = {"_repr": repr, "_INF": _INF, "_special": _special, "_str": encode_basestring_ascii,
+                              "_loads": json.loads, "_splice": _splice}
+        exec(compile(src, f"<{etype} encoder>", "exec"), ns)
+        self.args = tuple(args)
+        self.index = {a: i for i, a in enumerate(args)}
+        self.encode: Callable[..., bytes] = ns["encode"]
+        self.to_dict: Callable[..., Dict[str, Any]] = ns["to_dict"]
+
+
+FAST_EVENTS: Dict[str, EventSchema] = {etype: EventSchema(etype, f) for etype, f in EVENT_SCHEMAS.items()}
+
+
+def splice_json(d: Dict[str, Any]) -> str:
+    """The `"key": value, ...` text of a dict, for "*R" fields."""
+    return json.dumps(d)[1:-1]
@@ -1,6 +1,14 @@
 import json
+import queue
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from sim.log.binlog import BinaryEventEncoder
+from sim.log.fastjson import FAST_EVENTS
+from sim.log.sinks import MANIFEST_NAME, Compressor, FileSink, Manifest, SegmentedSink
 
 
 KEY_TYPES: Set[str] = {
@@ -13,38 +21,297 @@ KEY_TYPES: Set[str] = {
     "build_funded",
 }
 
+LOG_LEVELS = ("off", "key", "all")
+EVENT_FORMATS = ("jsonl", "binary")  # binary: events.bin, see sim.log.binlog
+EVENT_SETTINGS = ("on", "off", "builds")  # "builds": action_resolved for successful builds only
+
+
+class LogLevels:
+    """Which event types get written, resolved once per type.
+
+    `level` is the default for every type: "all" writes everything, "key"
+    keeps KEY_TYPES, snapshots and successful builds (what quiet runs have
+    always kept), "off" writes nothing. `overrides` switch single types
+    "on" or "off"; action_resolved also takes "builds".
+    """
+
+    def __init__(self, level: str = "all", overrides: Optional[Dict[str, str]] = None):
+        if level not in LOG_LEVELS:
+            raise ValueError(f"unknown log level {level!r} (expected one of {', '.join(LOG_LEVELS)})")
+        for etype, setting in (overrides or {}).items():
+            if setting not in EVENT_SETTINGS or (setting == "builds" and etype != "action_resolved"):
+                raise ValueError(f"bad log setting {etype}={setting!r}")
+        self.level = level
+        self.overrides = dict(overrides or {})
+        self._cache: Dict[str, str] = {}
+
+    def get(self, etype: str) -> str:
+        """"on", "off" or "builds" for this event type."""
+        setting = self._cache.get(etype)
+        if setting is None:
+            setting = self._cache[etype] = self._resolve(etype)
+        return setting
+
+    def _resolve(self, etype: str) -> str:
+        if etype in self.overrides:
+            return self.overrides[etype]
+        if self.level == "all":
+            return "on"
+        if self.level == "key":
+            if etype in KEY_TYPES or etype == "snapshot":
+                return "on"
+            if etype == "action_resolved":
+                return "builds"
+        return "off"
+
+
+@dataclass
+class FlushPolicy:
+    """When RunLogger pushes its files to the OS: after `every` writes, after
+    `interval_ms` of wall time, or right after a KEY_TYPES event. 0 / False
+    disables a trigger."""
+    every: int = 1000
+    interval_ms: float = 250.0
+    on_key: bool = True
+
+
+def _jsonl_line(obj: Dict[str, Any]) -> bytes:
+    return (json.dumps(obj) + "\n").encode("utf-8")
+
+
+def _jsonl_codec(existing: Optional[Path]) -> Tuple[bytes, Callable[[Dict[str, Any]], bytes]]:
+    return b"", _jsonl_line
+
+
+def _binary_codec(existing: Optional[Path]) -> Tuple[bytes, Callable[[Dict[str, Any]], bytes]]:
+    enc = BinaryEventEncoder()
+    if existing is not None:
+        enc.resume(existing)
+    return enc.header(), enc.encode
+
+
+Sink = Union[FileSink, SegmentedSink]
+
 
 class RunLogger:
-    def __init__(self, run_dir: Path, quiet: bool = False):
+    """Writes events.jsonl (or events.bin) and snapshots.jsonl for one run.
+
+    Call sites ask `enabled(type)` (or `level(type)`) before building an
+    event payload, so filtered-out types cost a dict lookup. Quiet runs
+    default to the "key" level and only flush on close; otherwise files are
+    flushed in groups according to `flush` (a FlushPolicy).
+
+    With `segment_ticks` > 0 both streams are split into tick-ranged
+    segments listed in manifest.json, and `compression` ("gzip" or "lzma")
+    packs each closed segment in the background (see sim.log.sinks).
+    """
+
+    def __init__(self, run_dir: Path, quiet: bool = False, resume_at: Optional[Tuple[Any, Any]] = None,
+                 levels: Optional[LogLevels] = None, flush: Optional[FlushPolicy] = None,
+                 event_format: str = "jsonl", segment_ticks: int = 0, compression: Optional[str] = None):
+        if event_format not in EVENT_FORMATS:
+            raise ValueError(f"unknown event format {event_format!r}")
+        if compression is not None and segment_ticks <= 0:
+            raise ValueError("compression needs segmented logs (segment_ticks > 0)")
         self.run_dir = run_dir
         self.quiet = quiet
-        self.events_path = run_dir / "events.jsonl"
-        self.snapshots_path = run_dir / "snapshots.jsonl"
+        self.levels = levels if levels is not None else LogLevels("key" if quiet else "all")
+        self.flush = None if quiet else (flush if flush is not None else FlushPolicy())
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+        self.event_format = event_format
+        self.segment_ticks = segment_ticks
+        self.compression = compression
+        ext = ".bin" if event_format == "binary" else ".jsonl"
+        codec = _binary_codec if event_format == "binary" else _jsonl_codec
+        events_at, snaps_at = resume_at if resume_at is not None else (None, None)
 
         self.run_dir.mkdir(parents=True, exist_ok=True)
-        self._events_f = self.events_path.open("a", encoding="utf-8")
-        self._snaps_f = self.snapshots_path.open("a", encoding="utf-8")
+        self._compressor: Optional[Compressor] = None
+        if segment_ticks > 0:
+            manifest = Manifest(run_dir / MANIFEST_NAME, segment_ticks, compression, fresh=resume_at is None)
+            self._compressor = comp = Compressor(compression, manifest)
+            self._events: Sink = SegmentedSink(run_dir, "events", ext, codec, segment_ticks, manifest, comp,
+                                               resume_at=events_at)
+            self._snaps: Sink = SegmentedSink(run_dir, "snapshots", ".jsonl", _jsonl_codec, segment_ticks,
+                                              manifest, comp, resume_at=snaps_at)
+        else:
+            self._events = FileSink(run_dir / ("events" + ext), codec, resume_at=events_at)
+            self._snaps = FileSink(run_dir / "snapshots.jsonl", _jsonl_codec, resume_at=snaps_at)
+
+    def level(self, etype: str) -> str:
+        return self.levels.get(etype)
+
+    def enabled(self, etype: str) -> bool:
+        return self.levels.get(etype) != "off"
 
     def event(self, obj: Dict[str, Any]) -> None:
-        if self.quiet:
-            t = obj.get("type", "")
-            if t in KEY_TYPES:
-                pass
-            elif t == "action_resolved" and str(obj.get("note", "")).startswith("built_"):
-                pass
-            else:
+        setting = self.levels.get(obj.get("type", ""))
+        if setting != "on":
+            if setting == "off" or not str(obj.get("note", "")).startswith("built_"):
                 return
-        self._events_f.write(json.dumps(obj) + "\n")
-        if not self.quiet:
-            self._events_f.flush()
+        self._write(self._events, obj)
+
+    def event_fields(self, etype: str, *fields: Any) -> None:
+        """`event()` for the fixed-shape types in sim.log.fastjson, given
+        their fields in schema order; JSONL lines are written without ever
+        building the event dict."""
+        schema = FAST_EVENTS[etype]
+        setting = self.levels.get(etype)
+        if setting != "on":
+            note = schema.index.get("note")
+            if setting == "off" or note is None or not str(fields[note]).startswith("built_"):
+                return
+        if self.event_format == "jsonl":
+            self._write_encoded(self._events, fields[schema.index["tick"]], schema.encode(*fields), etype)
+        else:
+            self._write(self._events, schema.to_dict(*fields))
+
+    def snapshot(self, obj: Dict[str, Any]) -> None:
+        if self.levels.get("snapshot") == "off":
+            return
+        self._write(self._snaps, obj)
+
+    def _write(self, sink: Sink, obj: Dict[str, Any]) -> None:
+        sink.write(obj)
+        if self._flush_due(obj.get("type")):
+            self._events.flush()
+            self._snaps.flush()
+
+    def _write_encoded(self, sink: Sink, tick: Any, data: bytes, etype: str) -> None:
+        sink.write_encoded(tick, data)
+        if self._flush_due(etype):
+            self._events.flush()
+            self._snaps.flush()
+
+    def _flush_due(self, etype: Any) -> bool:
+        policy = self.flush
+        if policy is None:
+            return False
+        self._unflushed += 1
+        if ((policy.on_key and etype in KEY_TYPES)
+                or (policy.every and self._unflushed >= policy.every)
+                or (policy.interval_ms and (time.monotonic() - self._flushed_at) * 1000.0 >= policy.interval_ms)):
+            self._unflushed = 0
+            self._flushed_at = time.monotonic()
+            return True
+        return False
+
+    def position(self) -> Tuple[Any, Any]:
+        """Flush and return where (events, snapshots) stand: byte sizes, or
+        (segment first tick, byte size) pairs for segmented logs."""
+        return self._events.position(), self._snaps.position()
+
+    def close(self) -> None:
+        self._events.close()
+        self._snaps.close()
+        if self._compressor is not None:
+            self._compressor.close()
+
+
+class ThreadedRunLogger(RunLogger):
+    """RunLogger that serializes and writes on a background thread.
+
+    The tick loop only appends payloads to a batch. Full batches, and any
+    batch whose last event makes a flush due, go through one bounded queue
+    (`queue_size` batches, 0 = unbounded) to the writer; when it is full
+    the simulation waits. A single queue keeps both files in logging order.
+    Payloads must not be mutated once logged. `event_fields()` lines are
+    still encoded inline: they are cheap and must not hold live objects.
+    """
+
+    def __init__(self, run_dir: Path, quiet: bool = False, resume_at: Optional[Tuple[Any, Any]] = None,
+                 levels: Optional[LogLevels] = None, flush: Optional[FlushPolicy] = None,
+                 event_format: str = "jsonl", segment_ticks: int = 0, compression: Optional[str] = None,
+                 queue_size: int = 64, batch_size: int = 256):
+        super().__init__(run_dir, quiet=quiet, resume_at=resume_at, levels=levels, flush=flush,
+                         event_format=event_format, segment_ticks=segment_ticks, compression=compression)
+        self.batch_size = batch_size
+        # (sink, event dict, None) or (sink, tick, pre-encoded line)
+        self._batch: List[Tuple[Sink, Any, Optional[bytes]]] = []
+        self._queue: "queue.Queue[Optional[Tuple[List[Any], bool]]]" = queue.Queue(queue_size)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=f"log-writer-{run_dir.name}", daemon=True)
+        self._thread.start()
+
+    def _write(self, sink: Sink, obj: Dict[str, Any]) -> None:
+        self._batch.append((sink, obj, None))
+        if self._flush_due(obj.get("type")):
+            self._send(flush=True)
+        elif len(self._batch) >= self.batch_size:
+            self._send()
+
+    def _write_encoded(self, sink: Sink, tick: Any, data: bytes, etype: str) -> None:
+        self._batch.append((sink, tick, data))
+        if self._flush_due(etype):
+            self._send(flush=True)
+        elif len(self._batch) >= self.batch_size:
+            self._send()
+
+    def _send(self, flush: bool = False) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"log writer for {self.run_dir} failed") from self._error
+        if self._batch:
+            self._queue.put((self._batch, flush))
+            self._batch = []
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    batch, flush = item
+                    for sink, obj, data in batch:
+                        if data is None:
+                            sink.write(obj)
+                        else:
+                            sink.write_encoded(obj, data)
+                    if flush:
+                        self._events.flush()
+                        self._snaps.flush()
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def position(self) -> Tuple[Any, Any]:
+        self._send()
+        self._queue.join()
+        self._send()  # re-raise a writer error
+        return super().position()
+
+    def close(self) -> None:
+        self._send()
+        self._queue.put(None)
+        self._thread.join()
+        super().close()
+        if self._error is not None:
+            raise RuntimeError(f"log writer for {self.run_dir} failed") from self._error
+
+
+class NullLogger:
+    """RunLogger stand-in for headless runs: accepts everything, writes nothing."""
+    quiet = True
+
+    def level(self, etype: str) -> str:
+        return "off"
+
+    def enabled(self, etype: str) -> bool:
+        return False
+
+    def event(self, obj: Dict[str, Any]) -> None:
+        pass
+
+    def event_fields(self, etype: str, *fields: Any) -> None:
+        pass
 
     def snapshot(self, obj: Dict[str, Any]) -> None:
-        self._snaps_f.write(json.dumps(obj) + "\n")
-        if not self.quiet:
-            self._snaps_f.flush()
+        pass
+
+    def position(self) -> Tuple[int, int]:
+        return 0, 0
 
     def close(self) -> None:
-        self._events_f.flush()
-        self._snaps_f.flush()
-        self._events_f.close()
-        self._snaps_f.close()
+        pass
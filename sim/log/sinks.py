@@ -0,0 +1,243 @@
+"""Where RunLogger streams end up: one file, or tick-ranged segments.
+
+With segmentation each stream (events, snapshots) is split into files
+covering `segment_ticks` ticks each, named after their first tick
+(events-00001000.jsonl). Closed segments are compressed with gzip or lzma
+on a background thread, and manifest.json maps every segment's tick range
+to its current file name, so readers only open what they need.
+"""
+import gzip
+import json
+import lzma
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+MANIFEST_NAME = "manifest.json"
+COMPRESSIONS = {"gzip": (".gz", gzip.open), "lzma": (".xz", lzma.open)}
+
+# codec(existing_path) -> (header for a new file, encode function); given the
+# path of a file being appended to, the codec picks up its state instead
+Codec = Callable[[Optional[Path]], Tuple[bytes, Callable[[Dict[str, Any]], bytes]]]
+
+
+def _truncate(path: Path, size: int) -> None:
+    with path.open("r+b") as f:
+        f.truncate(size)
+
+
+class FileSink:
+    """One append-only log file. `position()` is its size in bytes."""
+
+    def __init__(self, path: Path, codec: Codec, resume_at: Optional[int] = None):
+        self.path = path
+        if resume_at is not None:
+            # drop whatever was written after the checkpoint we resume from
+            _truncate(path, resume_at)
+        self._f: BinaryIO = path.open("ab")
+        existing = self._f.tell() > 0
+        header, self._encode = codec(path if existing else None)
+        if not existing:
+            self._f.write(header)
+
+    def write(self, obj: Dict[str, Any]) -> None:
+        self._f.write(self._encode(obj))
+
+    def write_encoded(self, tick: Any, data: bytes) -> None:
+        """Append a record the caller already encoded (JSONL lines only)."""
+        self._f.write(data)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def position(self) -> int:
+        self._f.flush()
+        return self._f.tell()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class Manifest:
+    """manifest.json: per stream, the segments in tick order as
+    {"file", "first_tick", "last_tick"}. Saved atomically on every change."""
+
+    def __init__(self, path: Path, segment_ticks: int, compression: Optional[str], fresh: bool = True):
+        self.path = path
+        self._lock = threading.Lock()
+        if not fresh and path.exists():
+            self.data = json.loads(path.read_text(encoding="utf-8"))
+        else:
+            self.data = {"segment_ticks": segment_ticks, "compression": compression, "streams": {}}
+            self._save()
+
+    def segments(self, stream: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(e) for e in self.data["streams"].get(stream, [])]
+
+    def opened(self, stream: str, first_tick: int, last_tick: int, file: str) -> None:
+        with self._lock:
+            entries = self.data["streams"].setdefault(stream, [])
+            entries[:] = [e for e in entries if e["first_tick"] != first_tick]
+            entries.append({"file": file, "first_tick": first_tick, "last_tick": last_tick})
+            entries.sort(key=lambda e: e["first_tick"])
+            self._save()
+
+    def renamed(self, stream: str, first_tick: int, file: str) -> None:
+        with self._lock:
+            for e in self.data["streams"].get(stream, []):
+                if e["first_tick"] == first_tick:
+                    e["file"] = file
+            self._save()
+
+    def drop_after(self, stream: str, first_tick: int) -> List[Dict[str, Any]]:
+        """Forget segments starting after `first_tick`; returns them."""
+        with self._lock:
+            entries = self.data["streams"].setdefault(stream, [])
+            dropped = [e for e in entries if e["first_tick"] > first_tick]
+            entries[:] = [e for e in entries if e["first_tick"] <= first_tick]
+            self._save()
+            return dropped
+
+    def _save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class Compressor:
+    """Compresses closed segments on a background thread, then swaps the
+    manifest entry to the compressed file and removes the original."""
+
+    def __init__(self, method: Optional[str], manifest: Manifest):
+        if method is not None and method not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {method!r} (expected one of {', '.join(COMPRESSIONS)})")
+        self.method = method
+        self.manifest = manifest
+        self._error: Optional[BaseException] = None
+        self._queue: "queue.Queue[Optional[Tuple[str, int, Path]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        if method is not None:
+            self._thread = threading.Thread(target=self._run, name="log-compressor", daemon=True)
+            self._thread.start()
+
+    def compressed_path(self, path: Path) -> Optional[Path]:
+        if self.method is None:
+            return None
+        return path.with_name(path.name + COMPRESSIONS[self.method][0])
+
+    def submit(self, stream: str, first_tick: int, path: Path) -> None:
+        if self._thread is not None:
+            self._queue.put((stream, first_tick, path))
+
+    def _run(self) -> None:
+        suffix, opener = COMPRESSIONS[self.method]  # type: ignore[index]
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            stream, first_tick, path = item
+            try:
+                out = path.with_name(path.name + suffix)
+                tmp = path.with_name(out.name + ".tmp")
+                with path.open("rb") as src, opener(tmp, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                os.replace(tmp, out)
+                self.manifest.renamed(stream, first_tick, out.name)
+                os.remove(path)
+            except BaseException as e:
+                self._error = e
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            raise RuntimeError("log compression failed") from self._error
+
+
+class SegmentedSink:
+    """A stream split into `segment_ticks`-tick files, rolled over by the
+    "tick" field of what is written (records without one stay in the current
+    segment). `position()` is (first tick of the current segment, size)."""
+
+    def __init__(self, run_dir: Path, stream: str, ext: str, codec: Codec, segment_ticks: int,
+                 manifest: Manifest, compressor: Compressor, resume_at: Optional[Tuple[int, int]] = None):
+        self.run_dir, self.stream, self.ext, self.codec = run_dir, stream, ext, codec
+        self.segment_ticks = segment_ticks
+        self.manifest, self.compressor = manifest, compressor
+        self._f: Optional[BinaryIO] = None
+        if resume_at is None:
+            self._open(0)
+            return
+        first, size = resume_at
+        for e in manifest.drop_after(stream, first):
+            for name in (e["file"], self._name(e["first_tick"])):
+                if (run_dir / name).exists():
+                    os.remove(run_dir / name)
+        # segments closed before the crash but not compressed yet
+        for e in manifest.segments(stream):
+            if e["first_tick"] < first and e["file"] == self._name(e["first_tick"]) \
+                    and (run_dir / e["file"]).exists():
+                compressor.submit(stream, e["first_tick"], run_dir / e["file"])
+        self._open(first, size)
+
+    def _name(self, first_tick: int) -> str:
+        return f"{self.stream}-{first_tick:08d}{self.ext}"
+
+    def _open(self, first_tick: int, resume_size: Optional[int] = None) -> None:
+        self._first = first_tick
+        self._end = first_tick + self.segment_ticks
+        self._path = path = self.run_dir / self._name(first_tick)
+        if resume_size is not None:
+            packed = self.compressor.compressed_path(path)
+            if packed is not None and packed.exists():
+                if not path.exists():
+                    opener = COMPRESSIONS[self.compressor.method][1]  # type: ignore[index]
+                    with opener(packed, "rb") as src, path.open("wb") as dst:
+                        shutil.copyfileobj(src, dst, 1 << 20)
+                os.remove(packed)
+            path.touch()
+            _truncate(path, resume_size)
+        self._f = path.open("ab")
+        existing = self._f.tell() > 0
+        header, self._encode = self.codec(path if existing else None)
+        if not existing:
+            self._f.write(header)
+        self.manifest.opened(self.stream, first_tick, self._end - 1, path.name)
+
+    def _close_segment(self) -> None:
+        assert self._f is not None
+        self._f.close()
+        self._f = None
+        self.compressor.submit(self.stream, self._first, self._path)
+
+    def _roll(self, tick: Any) -> None:
+        if type(tick) is int and tick >= self._end:
+            self._close_segment()
+            self._open(tick - tick % self.segment_ticks)
+
+    def write(self, obj: Dict[str, Any]) -> None:
+        self._roll(obj.get("tick"))
+        self._f.write(self._encode(obj))  # type: ignore[union-attr]
+
+    def write_encoded(self, tick: Any, data: bytes) -> None:
+        """Append a record the caller already encoded (JSONL lines only:
+        binary records depend on the segment's string and schema tables)."""
+        self._roll(tick)
+        self._f.write(data)  # type: ignore[union-attr]
+
+    def flush(self) -> None:
+        self._f.flush()  # type: ignore[union-attr]
+
+    def position(self) -> Tuple[int, int]:
+        self._f.flush()  # type: ignore[union-attr]
+        return self._first, self._f.tell()  # type: ignore[union-attr]
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._close_segment()
@@ -55,24 +55,24 @@ def train_es(gens: int, pop: int, ticks: int, seed: int, snapshot_every: int = 0
     print(f"[train] starting best_score={best_score}")
 
     for g in range(gens):
-        candidates: List[Tuple[float, Dict[str, float], str]] = []
+        candidates: List[Tuple[float, Dict[str, float]]] = []
 
         # include incumbent
-        score0, run_id0 = run_sim(seed=seed, ticks=ticks, snapshot_every=snapshot_every,
-                                 agent_kind="utility", policy_weights=best_weights, return_score=True)
-        candidates.append((score0, dict(best_weights), run_id0))
+        res0 = run_sim(seed=seed, ticks=ticks, snapshot_every=snapshot_every,
+                       agent_kind="utility", policy_weights=best_weights, headless=True)
+        candidates.append((res0.score, dict(best_weights)))
 
         # mutants
         for i in range(pop - 1):
             mw = clamp(mutate({k: float(v) for k, v in best_weights.items() if isinstance(v, (int, float))}, rng))
-            s, rid = run_sim(seed=seed, ticks=ticks, snapshot_every=snapshot_every,
-                             agent_kind="utility", policy_weights=mw, return_score=True)
-            candidates.append((s, mw, rid))
+            res = run_sim(seed=seed, ticks=ticks, snapshot_every=snapshot_every,
+                          agent_kind="utility", policy_weights=mw, headless=True)
+            candidates.append((res.score, mw))
 
         candidates.sort(key=lambda x: x[0], reverse=True)
-        top_score, top_w, top_run = candidates[0]
+        top_score, top_w = candidates[0]
 
-        print(f"[gen {g+1}/{gens}] top_score={top_score} (run={top_run})")
+        print(f"[gen {g+1}/{gens}] top_score={top_score}")
 
         if top_score > best_score:
             best_score = top_score
@@ -0,0 +1,36 @@
+"""Building type codes for AI-world.
+
+Structures store a small int code; names are only used at the
+serialisation boundary (logs, observations, config).
+"""
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Dict, Tuple
+
+
+class Building(IntEnum):
+    HUT = 0
+    STORAGE = 1
+    FARM = 2
+    GRANARY = 3
+    MINE = 4
+    ROAD = 5
+    WORKSHOP = 6
+    BARRACKS = 7
+    MARKET = 8
+    TEMPLE = 9
+    ACADEMY = 10
+    WALLS = 11
+    IRRIGATION = 12
+    LIBRARY = 13
+    FOUNDRY = 14
+    HALL = 15
+    COMMAND = 16
+    LAB = 17
+    OBSERVATORY = 18
+
+
+BUILDING_NAMES: Tuple[str, ...] = tuple(b.name.lower() for b in Building)
+BUILDING_CODES: Dict[str, int] = {name: code for code, name in enumerate(BUILDING_NAMES)}
+NUM_BUILDINGS = len(BUILDING_NAMES)
@@ -1,32 +1,22 @@
 from sim.core.rng import RNG
 from sim.world.config import WorldConfig
-from sim.world.state import Tile, WorldState, AgentState
+from sim.world.state import TileGrid, WorldState, AgentTable, StructureTable
 
 
 def make_world(cfg: WorldConfig, rng: RNG, num_agents: int = 4) -> WorldState:
-    tiles = []
+    food, wood, stone = [], [], []
     for _ in range(cfg.width * cfg.height):
-        tiles.append(
-            Tile(
-                food=rng.randint(0, cfg.max_food),
-                wood=rng.randint(0, cfg.max_wood),
-                stone=rng.randint(0, cfg.max_stone),
-            )
-        )
+        food.append(rng.randint(0, cfg.max_food))
+        wood.append(rng.randint(0, cfg.max_wood))
+        stone.append(rng.randint(0, cfg.max_stone))
+    tiles = TileGrid(cfg.width, cfg.height, food, wood, stone)
 
-    agents = []
     n = max(1, int(num_agents))
-    for i in range(n):
-        agents.append(
-            AgentState(
-                agent_id=f"A{i}",
-                x=rng.randint(0, cfg.width - 1),
-                y=rng.randint(0, cfg.height - 1),
-                inv_food=0,
-                inv_wood=0,
-                inv_stone=0,
-            )
-        )
+    xs, ys = [], []
+    for _ in range(n):
+        xs.append(rng.randint(0, cfg.width - 1))
+        ys.append(rng.randint(0, cfg.height - 1))
+    agents = AgentTable([f"A{i}" for i in range(n)], xs, ys, [0] * n, [0] * n, [0] * n)
 
     return WorldState(
         tick=0,
@@ -34,6 +24,6 @@ def make_world(cfg: WorldConfig, rng: RNG, num_agents: int = 4) -> WorldState:
         height=cfg.height,
         tiles=tiles,
         agents=agents,
-        structures=[],
+        structures=StructureTable(),
         settlements=[],
     )
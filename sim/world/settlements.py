@@ -1,7 +1,14 @@
 """Settlement management for AI-world."""
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import json
+from dataclasses import asdict, dataclass, fields
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sim.log.fastjson import splice_json
+from sim.world.buildings import Building as B, BUILDING_CODES, BUILDING_NAMES, NUM_BUILDINGS
+from sim.world.spatial import CellIndex
 
 
 SETTLEMENT_RULES = {
@@ -71,37 +78,338 @@ SETTLEMENT_RULES = {
 }
 
 
-def pos_key(x: int, y: int) -> str:
-    return f"{x},{y}"
+@dataclass(frozen=True, slots=True)
+class SettlementRules:
+    """SETTLEMENT_RULES resolved once per run into typed, read-only attributes.
+
+    Build with `SettlementRules.build(overrides)`; the module dict itself is
+    never mutated, so concurrent runs can use different rule sets.
+    """
+    starting_population: int
+    food_per_pop_per_tick: float
+    growth_food_buffer: float
+    max_pop_growth_per_tick: int
+    surplus_ticks_for_growth: int
+    starve_ticks_for_loss: int
+    farm_yield_per_tick: float
+    granary_food_per_tick: float
+    granary_starve_ticks: int
+    mine_stone_per_tick: float
+    deposit_range_default: int
+    deposit_range_with_road: int
+    workshop_tools_per_tick: float
+    workshop_farm_bonus: float
+    workshop_mine_bonus: float
+    tools_consume_per_boost: float
+    barracks_soldiers_per_tick: float
+    command_soldiers_per_tick: float
+    soldier_food_consume: float
+    soldier_soft_cap_per_pop: float
+    soldier_defend_cost: float
+    raid_interval: int
+    raid_min_soldiers: float
+    raid_cost: float
+    raid_loot_wood: int
+    raid_loot_stone: int
+    raid_loot_food: int
+    raid_loot_scale: float
+    raid_loot_cap: int
+    raid_defender_loss: float
+    raid_defender_loss_walls: float
+    raid_defender_loss_strategy: float
+    age_up_min_pop: int
+    age_up_food_bonus: float
+    era3_farm_bonus: float
+    market_wood_per_tick: float
+    market_stone_per_tick: float
+    temple_food_per_tick: float
+    temple_surplus_ticks: int
+    academy_knowledge_per_tick: float
+    library_knowledge_per_tick: float
+    lab_knowledge_per_tick: float
+    observatory_knowledge_per_tick: float
+    foundry_tools_bonus: float
+    hall_food_per_tick: float
+    subject_agriculture_cost: float
+    subject_craft_cost: float
+    subject_organisation_cost: float
+    subject_strategy_cost: float
+    subject_inquiry_cost: float
+    agriculture_farm_bonus: float
+    craft_tools_bonus: float
+    organisation_surplus_reduction: int
+    strategy_defend_bonus: float
+    walls_defend_bonus: float
+    walls_raid_extra_cost: float
+    age_up4_min_pop: int
+    age_up4_food_bonus: float
+    era4_farm_bonus: float
+    irrigation_farm_bonus: float
+    discovery_cost: float
+    discovery_farm_bonus: float
+    discovery_max: int
+
+    @classmethod
+    def build(cls, overrides: Optional[Dict[str, Any]] = None) -> "SettlementRules":
+        merged = dict(SETTLEMENT_RULES)
+        for k, v in (overrides or {}).items():
+            if k not in merged:
+                raise ValueError(f"unknown settlement rule: {k}")
+            merged[k] = v
+        return cls(**{f.name: cls._coerce(f.name, f.type, merged[f.name]) for f in fields(cls)})
+
+    @classmethod
+    def parse(cls, name: str, text: str) -> Any:
+        """Parse an override given as text (e.g. `--rule NAME=VALUE`) by the
+        rule's declared type; int rules reject anything but an integer."""
+        types = {f.name: f.type for f in fields(cls)}
+        if name not in types:
+            raise ValueError(f"unknown settlement rule: {name}")
+        if types[name] == "int":
+            try:
+                return int(text)
+            except ValueError:
+                raise ValueError(f"{name}: not an integer: {text!r}") from None
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f"{name}: not a number: {text!r}") from None
+
+    @staticmethod
+    def _coerce(name: str, ftype: str, v: Any) -> Any:
+        if ftype != "int":
+            return float(v)
+        if isinstance(v, float) and not v.is_integer():
+            raise ValueError(f"{name}: not an integer: {v!r}")
+        return int(v)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def pos_key(x: int, y: int) -> Tuple[int, int]:
+    return (x, y)
+
+
+_NO_STRUCTURES: Tuple[int, ...] = (0,) * NUM_BUILDINGS
+
+
+# Per-farm yield bonuses, added to the base farm yield in this order:
+# (building, min era, subject, rule, needs a positive yield so far).
+FARM_BONUSES: Tuple[Tuple[Optional[str], int, Optional[str], str, bool], ...] = (
+    ("workshop", 0, None, "workshop_farm_bonus", True),
+    (None, 3, None, "era3_farm_bonus", False),
+    (None, 4, None, "era4_farm_bonus", False),
+    (None, 0, "agriculture", "agriculture_farm_bonus", False),
+    ("irrigation", 0, None, "irrigation_farm_bonus", False),
+)
+
+# Per-tick income after the farm harvest, applied in this order:
+# (stock, metric, parts, mode). Each part is (buildings, subject, rule); the
+# rules of every part the settlement qualifies for are summed left to right
+# into a single increment. mode "positive" applies the row when that sum is
+# > 0, "present" whenever any part qualifies, and "recruit" scales it by the
+# soldier soft-cap factor.
+PRODUCTION_TABLE: Tuple[Tuple[str, str, Tuple[Tuple[Tuple[str, ...], Optional[str], str], ...], str], ...] = (
+    ("food_stock", "granary_food_total", ((("granary",), None, "granary_food_per_tick"),), "positive"),
+    ("stone_stock", "mine_stone_total", (
+        (("mine",), None, "mine_stone_per_tick"),
+        (("mine", "workshop"), None, "workshop_mine_bonus"),
+    ), "present"),
+    ("tools_stock", "workshop_tools_total", (
+        (("workshop",), None, "workshop_tools_per_tick"),
+        (("workshop",), "craft", "craft_tools_bonus"),
+        (("foundry",), None, "foundry_tools_bonus"),
+    ), "present"),
+    ("soldiers", "barracks_soldiers_total", ((("barracks",), None, "barracks_soldiers_per_tick"),), "recruit"),
+    ("soldiers", "command_soldiers_total", ((("command",), None, "command_soldiers_per_tick"),), "recruit"),
+    ("wood_stock", "market_wood_total", ((("market",), None, "market_wood_per_tick"),), "present"),
+    ("stone_stock", "market_stone_total", ((("market",), None, "market_stone_per_tick"),), "present"),
+    ("food_stock", "temple_food_total", ((("temple",), None, "temple_food_per_tick"),), "present"),
+    ("food_stock", "hall_food_total", ((("hall",), None, "hall_food_per_tick"),), "present"),
+    ("knowledge", "academy_knowledge_total", (
+        (("academy",), None, "academy_knowledge_per_tick"),
+        (("library",), None, "library_knowledge_per_tick"),
+        (("lab",), None, "lab_knowledge_per_tick"),
+        (("observatory",), None, "observatory_knowledge_per_tick"),
+    ), "positive"),
+)
+
+# Buildings reported as has_<name> on population_changed, in logged order.
+_LOGGED_FLAGS = ("granary", "mine", "workshop", "barracks", "academy", "walls", "irrigation",
+                 "library", "foundry", "hall", "command", "lab", "observatory")
+
+
+class Production:
+    """What one settlement yields per tick, derived from its buildings, era,
+    subjects and discoveries. Rebuilt only when one of those changes."""
+    __slots__ = ("version", "farm_yield", "granary_bonus", "income", "flags", "subjects", "era",
+                 "flags_json", "subjects_json",
+                 "cap_scale", "learns", "unlocks", "discovers",
+                 "starve_needed", "surplus_needed", "defend_cost")
+
+    def __init__(self, version: int, s: SettlementRecord, counts, rules: SettlementRules):
+        has = {name: counts[code] > 0 for name, code in BUILDING_CODES.items()}
+        subjects = list(s.subjects)
+        era = s.era
+        farms = counts[B.FARM]
+        self.version = version
+        self.subjects = subjects
+        self.era = era
+
+        farm_yield = farms * rules.farm_yield_per_tick if farms > 0 else 0.0
+        if farms > 0:
+            for building, min_era, subject, rule, on_yield in FARM_BONUSES:
+                if building is not None and not has[building]:
+                    continue
+                if on_yield and not farm_yield > 0:
+                    continue
+                if era >= min_era and (subject is None or subject in subjects):
+                    farm_yield += farms * getattr(rules, rule)
+            if s.discoveries > 0:
+                farm_yield += farms * s.discoveries * rules.discovery_farm_bonus
+        self.farm_yield = farm_yield
+        self.granary_bonus = rules.granary_food_per_tick if has["granary"] else 0.0
+
+        # (stock, metric, amount, recruit) rows that actually apply
+        self.income: List[Tuple[str, str, float, bool]] = []
+        self.learns = False
+        for stock, metric, parts, mode in PRODUCTION_TABLE:
+            amount = 0.0
+            hit = False
+            for buildings, subject, rule in parts:
+                if all(has[b] for b in buildings) and (subject is None or subject in subjects):
+                    amount += getattr(rules, rule)
+                    hit = True
+            if (amount > 0) if mode == "positive" else hit:
+                self.income.append((stock, metric, amount, mode == "recruit"))
+                if stock == "knowledge":
+                    self.learns = True
+        self.flags = {f"has_{name}": has[name] for name in _LOGGED_FLAGS}
+        # pre-encoded for population_changed, see sim.log.fastjson
+        self.flags_json = splice_json(self.flags)
+        self.subjects_json = json.dumps(subjects)
+        self.unlocks = has["academy"]
+        self.discovers = has["observatory"]
+        self.cap_scale = 1.25 if has["command"] else 1.0
+
+        self.starve_needed = rules.granary_starve_ticks if has["granary"] else rules.starve_ticks_for_loss
+        surplus_needed = rules.temple_surplus_ticks if has["temple"] else rules.surplus_ticks_for_growth
+        if "organisation" in subjects:
+            surplus_needed = max(1, surplus_needed - rules.organisation_surplus_reduction)
+        if has["hall"]:
+            surplus_needed = max(1, surplus_needed - 1)
+        self.surplus_needed = surplus_needed
+        defend_cost = rules.soldier_defend_cost
+        if "strategy" in subjects:
+            defend_cost = max(0.5, defend_cost - rules.strategy_defend_bonus)
+        if has["walls"]:
+            defend_cost = max(0.4, defend_cost - rules.walls_defend_bonus)
+        self.defend_cost = defend_cost
+
+
+class SettlementRecord:
+    """Typed settlement state. `to_dict()` is the logged / observed form.
+
+    food/wood/stone stocks start as ints and only turn float once a
+    fractional income lands, exactly as the logged values always have.
+    """
+    __slots__ = ("id", "x", "y", "owner_id", "population",
+                 "food_stock", "wood_stock", "stone_stock", "tools_stock",
+                 "soldiers", "knowledge", "discoveries", "subjects", "era",
+                 "starve_ticks", "surplus_ticks")
+
+    def __init__(self, sid: str, x: int, y: int, owner_id: str, population: int):
+        self.id = sid
+        self.x = x
+        self.y = y
+        self.owner_id = owner_id
+        self.population: int = population
+        self.food_stock: float = 0
+        self.wood_stock: float = 0
+        self.stone_stock: float = 0
+        self.tools_stock: float = 0.0
+        self.soldiers: float = 0.0
+        self.knowledge: float = 0.0
+        self.discoveries: int = 0
+        self.subjects: List[str] = []
+        self.era: int = 2
+        self.starve_ticks: int = 0
+        self.surplus_ticks: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "x": self.x, "y": self.y, "owner_id": self.owner_id,
+            "population": self.population,
+            "food_stock": self.food_stock, "wood_stock": self.wood_stock, "stone_stock": self.stone_stock,
+            "tools_stock": self.tools_stock, "soldiers": self.soldiers, "knowledge": self.knowledge,
+            "discoveries": self.discoveries,
+            "subjects": self.subjects, "era": self.era,
+            "starve_ticks": self.starve_ticks, "surplus_ticks": self.surplus_ticks,
+        }
 
 
 class SettlementManager:
-    def __init__(self, metrics: Dict[str, Any], logger):
-        self.settlements: Dict[str, Dict[str, Any]] = {}
-        self.struct_to_settlement: Dict[str, str] = {}
+    def __init__(self, metrics: Dict[str, Any], logger, rules: Optional[SettlementRules] = None):
+        self.rules = rules if rules is not None else SettlementRules.build()
+        self.settlements: Dict[str, SettlementRecord] = {}
+        self.struct_to_settlement: Dict[Tuple[int, int], str] = {}
+        # settlement id -> per-building-code counts, kept in step with link_structure
+        self.struct_counts: Dict[str, List[int]] = {}
+        self._counted: Dict[Tuple[int, int], Tuple[str, int]] = {}  # pos -> (sid, code) last counted
+        # world-wide building counts and (era, subject) -> settlements that reached it
+        self.global_counts: List[int] = [0] * NUM_BUILDINGS
+        self._progress: Dict[Tuple[int, Optional[str]], List[str]] = {}
+        # per-tile nearest settlement id / distance, patched in create()
+        self._near_w = self._near_h = 0
+        self._near_sid: List[Optional[str]] = []
+        self._near_d: List[int] = []
+        # per-settlement version of everything Production depends on, and the
+        # Production built at that version
+        self._version: Dict[str, int] = {}
+        self._production: Dict[str, Production] = {}
+        # like _version but also bumped when starve_ticks changes; world_version
+        # is bumped by any settlement's _touch (see state_version())
+        self._state_version: Dict[str, int] = {}
+        self.world_version = 0
+        # bumped on any change to what all() reports; snapshot() is rebuilt lazily
+        self.revision = 0
+        self._snap: Dict[str, Mapping[str, Any]] = {}
+        self._snap_all: Tuple[Mapping[str, Any], ...] = ()
+        self._snap_rev = 0
+        # settlement anchors by creation order, for radius queries
+        self._sids: List[str] = []
+        self._index = CellIndex()
+        self._counts_snap: Dict[str, Tuple[int, Mapping[str, int]]] = {}
         self.metrics = metrics
         self.logger = logger
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # snapshot and production caches are rebuilt on demand; the logger is
+        # re-attached by whoever unpickles the manager
+        state = dict(self.__dict__)
+        state.update(logger=None, _snap={}, _snap_all=(), _snap_rev=-1, _counts_snap={}, _production={})
+        return state
+
     def create(self, x, y, owner_id, world, tick) -> str:
         sid = f"s{len(self.settlements) + 1}"
-        self.settlements[sid] = {
-            "id": sid, "x": x, "y": y, "owner_id": owner_id,
-            "population": int(SETTLEMENT_RULES.get("starting_population", 1)),
-            "food_stock": 0, "wood_stock": 0, "stone_stock": 0,
-            "tools_stock": 0.0, "soldiers": 0.0, "knowledge": 0.0,
-            "discoveries": 0,
-            "subjects": [], "era": 2, "starve_ticks": 0, "surplus_ticks": 0,
-        }
+        s = self.settlements[sid] = SettlementRecord(
+            sid, x, y, owner_id, self.rules.starting_population)
         try:
             tile0 = world.tile_at(x, y)
             starter = min(int(getattr(tile0, "food", 0)), 2)
-            self.settlements[sid]["food_stock"] = starter
+            s.food_stock = starter
             if starter > 0:
                 tile0.food = int(getattr(tile0, "food", 0)) - starter
         except Exception:
-            self.settlements[sid]["food_stock"] = 2
+            s.food_stock = 2
+        self._patch_nearest_grid(sid, world)
+        self._note_progress(sid)
+        self._index.add(x, y, len(self._sids))
+        self._sids.append(sid)
+        self.revision += 1
         self.metrics["settlements_created"] += 1
-        self.logger.event({"type": "settlement_created", "tick": tick, "settlement": self.settlements[sid]})
+        self.logger.event({"type": "settlement_created", "tick": tick, "settlement": s.to_dict()})
         return sid
 
     def settlement_at_structure(self, x, y, world, tick) -> str:
@@ -121,33 +429,159 @@ class SettlementManager:
         if not self.settlements:
             sid = self.create(x, y, owner_id, world, tick)
             self.struct_to_settlement[pos_key(x, y)] = sid
+            self._count_structure(x, y, sid, world)
             return sid
         sid = self.settlement_at_structure(x, y, world, tick)
         s_anchor = self.settlements[sid]
-        if abs(x - s_anchor["x"]) + abs(y - s_anchor["y"]) >= 24:
+        if abs(x - s_anchor.x) + abs(y - s_anchor.y) >= 24:
             sid = self.create(x, y, owner_id, world, tick)
         self.struct_to_settlement[pos_key(x, y)] = sid
+        self._count_structure(x, y, sid, world)
         return sid
 
+    def _count_structure(self, x, y, sid, world) -> None:
+        # Called on every link, including re-links after a type overwrite, so the
+        # previous (sid, type) for this tile is released before the new one counts.
+        k = pos_key(x, y)
+        prev = self._counted.pop(k, None)
+        if prev is not None:
+            self.struct_counts[prev[0]][prev[1]] -= 1
+            self.global_counts[prev[1]] -= 1
+            self._touch(prev[0])
+        stx = world.structure_at(x, y)
+        if stx is None:
+            return
+        stx.settlement_id = sid
+        code = stx.code
+        counts = self.struct_counts.get(sid)
+        if counts is None:
+            counts = self.struct_counts[sid] = [0] * NUM_BUILDINGS
+        counts[code] += 1
+        self.global_counts[code] += 1
+        self._counted[k] = (sid, code)
+        self._touch(sid)
+
+    def _touch(self, sid) -> None:
+        """Mark `sid`'s buildings, era, subjects or discoveries as changed."""
+        self._version[sid] = self._version.get(sid, 0) + 1
+        self._state_version[sid] = self._state_version.get(sid, 0) + 1
+        self.world_version += 1
+
+    def state_version(self, sid) -> int:
+        """Bumped whenever `sid` links a structure, changes era, unlocks a
+        subject or discovery, or its starve_ticks change."""
+        return self._state_version.get(sid, 0)
+
+    def production(self, sid) -> Production:
+        v = self._version.get(sid, 0)
+        p = self._production.get(sid)
+        if p is None or p.version != v:
+            p = self._production[sid] = Production(
+                v, self.settlements[sid], self.struct_counts.get(sid, _NO_STRUCTURES), self.rules)
+        return p
+
+    def structure_counts(self, sid) -> List[int]:
+        """Per-building-code counts for `sid`, indexed by `Building`."""
+        return self.struct_counts.get(sid, _NO_STRUCTURES)
+
+    def any_structure_of_type(self, structure_type) -> bool:
+        code = BUILDING_CODES.get(structure_type)
+        return code is not None and self.global_counts[code] > 0
+
+    def _note_progress(self, sid) -> None:
+        # Eras and subjects only ever grow, so entries are added, never removed.
+        self._touch(sid)
+        s = self.settlements[sid]
+        for e in range(s.era + 1):
+            for key in [(e, None)] + [(e, subj) for subj in s.subjects]:
+                sids = self._progress.setdefault(key, [])
+                if sid not in sids:
+                    sids.append(sid)
+
+    def settlements_at(self, era: int, subject: Optional[str] = None) -> List[str]:
+        """Ids of settlements at era >= `era` (and holding `subject`, if given)."""
+        return self._progress.get((max(0, int(era)), subject), [])
+
+    def any_settlement_at(self, era: int, subject: Optional[str] = None) -> bool:
+        return bool(self.settlements_at(era, subject))
+
+    def _patch_nearest_grid(self, sid, world) -> None:
+        w, h = int(getattr(world, "width", 0) or 0), int(getattr(world, "height", 0) or 0)
+        if (w, h) != (self._near_w, self._near_h):
+            self._near_w, self._near_h = w, h
+            self._near_sid = [None] * (w * h)
+            self._near_d = [10**9] * (w * h)
+            new_sids = list(self.settlements)
+        else:
+            new_sids = [sid]
+        # Settlements are applied in creation order and only a strictly closer one
+        # takes a tile, so ties resolve exactly like the scan in nearest().
+        near_sid, near_d = self._near_sid, self._near_d
+        for nsid in new_sids:
+            sx, sy = self.settlements[nsid].x, self.settlements[nsid].y
+            i = 0
+            for ty in range(h):
+                dy = abs(ty - sy)
+                for tx in range(w):
+                    d = abs(tx - sx) + dy
+                    if d < near_d[i]:
+                        near_d[i] = d
+                        near_sid[i] = nsid
+                    i += 1
+
     def nearest(self, x, y) -> Optional[str]:
         if not self.settlements:
             return None
+        if 0 <= x < self._near_w and 0 <= y < self._near_h:
+            return self._near_sid[y * self._near_w + x]
         best_sid, best_d = None, 10**9
         for sid, s in self.settlements.items():
-            d = abs(x - s["x"]) + abs(y - s["y"])
+            d = abs(x - s.x) + abs(y - s.y)
             if d < best_d:
                 best_d, best_sid = d, sid
         return best_sid
 
     def distance_to(self, sid, x, y) -> int:
         s = self.settlements[sid]
-        return abs(x - s["x"]) + abs(y - s["y"])
+        return abs(x - s.x) + abs(y - s.y)
 
-    def get(self, sid) -> Dict[str, Any]:
+    def get(self, sid) -> SettlementRecord:
         return self.settlements[sid]
 
     def all(self) -> List[Dict[str, Any]]:
-        return list(self.settlements.values())
+        return [s.to_dict() for s in self.settlements.values()]
+
+    def mark_changed(self) -> None:
+        """Call after changing a settlement record from outside the manager."""
+        self.revision += 1
+
+    def snapshot(self) -> Tuple[Mapping[str, Any], ...]:
+        """Read-only `all()`, reused until the next revision."""
+        if self._snap_rev != self.revision:
+            self._snap = {sid: MappingProxyType(s.to_dict()) for sid, s in self.settlements.items()}
+            self._snap_all = tuple(self._snap.values())
+            self._snap_rev = self.revision
+        return self._snap_all
+
+    def observed(self, sid) -> Mapping[str, Any]:
+        """Read-only `get(sid).to_dict()` from the current snapshot."""
+        self.snapshot()
+        return self._snap[sid]
+
+    def near(self, x, y, radius) -> Tuple[Mapping[str, Any], ...]:
+        """Snapshot entries of settlements anchored within `radius` of (x, y)."""
+        self.snapshot()
+        return tuple(self._snap[self._sids[i]] for i in self._index.within(x, y, radius))
+
+    def observed_counts(self, sid) -> Mapping[str, int]:
+        """Read-only {building name: count} for `sid`, omitting zero counts."""
+        v = self._version.get(sid, 0)
+        hit = self._counts_snap.get(sid)
+        if hit is None or hit[0] != v:
+            counts = self.structure_counts(sid)
+            hit = self._counts_snap[sid] = (v, MappingProxyType(
+                {BUILDING_NAMES[code]: n for code, n in enumerate(counts) if n}))
+        return hit[1]
 
     def count(self) -> int:
         return len(self.settlements)
@@ -203,282 +637,154 @@ class SettlementManager:
         nearest_sid = self.nearest(agent.x, agent.y)
         if nearest_sid is None:
             return
-        dep_range = int(SETTLEMENT_RULES.get("deposit_range_default", 2))
+        dep_range = self.rules.deposit_range_default
         if world is not None and self.settlement_has_road(nearest_sid, world):
-            dep_range = int(SETTLEMENT_RULES.get("deposit_range_with_road", 3))
+            dep_range = self.rules.deposit_range_with_road
         if self.distance_to(nearest_sid, agent.x, agent.y) > dep_range:
             return
         s = self.settlements[nearest_sid]
+        if agent.inv_food > 0 or agent.inv_wood > 0 or agent.inv_stone > 0:
+            self.revision += 1
         if agent.inv_food > 0:
             deposited = agent.inv_food
-            s["food_stock"] += deposited
+            s.food_stock += deposited
             agent.inv_food = 0
             self.metrics["food_deposit_events"] += 1
             self.metrics["food_deposited_total"] += deposited
-            self.logger.event({"type": "food_deposited", "tick": tick, "agent_id": agent.agent_id,
-                               "settlement_id": nearest_sid, "amount": deposited, "food_stock": s["food_stock"]})
+            if self.logger.enabled("food_deposited"):
+                self.logger.event({"type": "food_deposited", "tick": tick, "agent_id": agent.agent_id,
+                                   "settlement_id": nearest_sid, "amount": deposited, "food_stock": s.food_stock})
         if agent.inv_wood > 0:
             deposited = agent.inv_wood
-            s["wood_stock"] += deposited
+            s.wood_stock += deposited
             agent.inv_wood = 0
             self.metrics["wood_deposit_events"] += 1
             self.metrics["wood_deposited_total"] += deposited
-            self.logger.event({"type": "wood_deposited", "tick": tick, "agent_id": agent.agent_id,
-                               "settlement_id": nearest_sid, "amount": deposited, "wood_stock": s["wood_stock"]})
+            if self.logger.enabled("wood_deposited"):
+                self.logger.event({"type": "wood_deposited", "tick": tick, "agent_id": agent.agent_id,
+                                   "settlement_id": nearest_sid, "amount": deposited, "wood_stock": s.wood_stock})
         if agent.inv_stone > 0:
             deposited = agent.inv_stone
-            s["stone_stock"] += deposited
+            s.stone_stock += deposited
             agent.inv_stone = 0
             self.metrics["stone_deposit_events"] += 1
             self.metrics["stone_deposited_total"] += deposited
-            self.logger.event({"type": "stone_deposited", "tick": tick, "agent_id": agent.agent_id,
-                               "settlement_id": nearest_sid, "amount": deposited, "stone_stock": s["stone_stock"]})
+            if self.logger.enabled("stone_deposited"):
+                self.logger.event({"type": "stone_deposited", "tick": tick, "agent_id": agent.agent_id,
+                                   "settlement_id": nearest_sid, "amount": deposited, "stone_stock": s.stone_stock})
 
     def tick(self, world, tick: int) -> None:
         if not self.settlements:
             return
-        cons = float(SETTLEMENT_RULES["food_per_pop_per_tick"])
-        buffer_food = float(SETTLEMENT_RULES["growth_food_buffer"])
-        max_growth = int(SETTLEMENT_RULES["max_pop_growth_per_tick"])
-        surplus_needed = int(SETTLEMENT_RULES.get("surplus_ticks_for_growth", 5))
-        starve_needed_default = int(SETTLEMENT_RULES.get("starve_ticks_for_loss", 4))
-        yield_per_farm = float(SETTLEMENT_RULES.get("farm_yield_per_tick", 1.65))
-        granary_food = float(SETTLEMENT_RULES.get("granary_food_per_tick", 0.65))
-        granary_starve = int(SETTLEMENT_RULES.get("granary_starve_ticks", 5))
-        mine_stone = float(SETTLEMENT_RULES.get("mine_stone_per_tick", 0.75))
-        workshop_tools = float(SETTLEMENT_RULES.get("workshop_tools_per_tick", 0.4))
-        workshop_farm_bonus = float(SETTLEMENT_RULES.get("workshop_farm_bonus", 0.30))
-        workshop_mine_bonus = float(SETTLEMENT_RULES.get("workshop_mine_bonus", 0.25))
+        self.revision += 1
+        cons = self.rules.food_per_pop_per_tick
+        buffer_food = self.rules.growth_food_buffer
+        max_growth = self.rules.max_pop_growth_per_tick
+        metrics = self.metrics
 
         for sid, s in self.settlements.items():
-            pop_before = int(s.get("population", 0))
-            stock_at_start = float(s.get("food_stock", 0))
-            farms = 0
-            has_granary = has_mine = has_workshop = has_barracks = has_market = has_temple = has_academy = has_walls = has_irrigation = has_library = has_foundry = has_hall = has_command = has_lab = has_observatory = False
-            for stx in world.structures:
-                if self.structure_settlement_id(stx.x, stx.y) != sid:
-                    continue
-                if stx.type == "farm":
-                    farms += 1
-                elif stx.type == "granary":
-                    has_granary = True
-                elif stx.type == "mine":
-                    has_mine = True
-                elif stx.type == "workshop":
-                    has_workshop = True
-                elif stx.type == "barracks":
-                    has_barracks = True
-                elif stx.type == "market":
-                    has_market = True
-                elif stx.type == "temple":
-                    has_temple = True
-                elif stx.type == "academy":
-                    has_academy = True
-                elif stx.type == "walls":
-                    has_walls = True
-                elif stx.type == "irrigation":
-                    has_irrigation = True
-                elif stx.type == "library":
-                    has_library = True
-                elif stx.type == "foundry":
-                    has_foundry = True
-                elif stx.type == "hall":
-                    has_hall = True
-                elif stx.type == "command":
-                    has_command = True
-                elif stx.type == "lab":
-                    has_lab = True
-                elif stx.type == "observatory":
-                    has_observatory = True
-
-            subjects = list(s.get("subjects") or [])
-            era = int(s.get("era", 2))
-            discoveries = int(s.get("discoveries", 0))
-
-            farm_yield = farms * yield_per_farm if farms > 0 else 0.0
-            if has_workshop and farm_yield > 0:
-                farm_yield += farms * workshop_farm_bonus
-            if era >= 3 and farms > 0:
-                farm_yield += farms * float(SETTLEMENT_RULES.get("era3_farm_bonus", 0.30))
-            if era >= 4 and farms > 0:
-                farm_yield += farms * float(SETTLEMENT_RULES.get("era4_farm_bonus", 0.15))
-            if "agriculture" in subjects and farms > 0:
-                farm_yield += farms * float(SETTLEMENT_RULES.get("agriculture_farm_bonus", 0.20))
-            if has_irrigation and farms > 0:
-                farm_yield += farms * float(SETTLEMENT_RULES.get("irrigation_farm_bonus", 0.25))
-            if discoveries > 0 and farms > 0:
-                farm_yield += farms * discoveries * float(SETTLEMENT_RULES.get("discovery_farm_bonus", 0.08))
-
-            bonus = granary_food if has_granary else 0.0
-            if farm_yield > 0 or bonus > 0:
-                s["food_stock"] = stock_at_start + farm_yield + bonus
-                if farm_yield > 0:
-                    self.metrics["farm_harvest_events"] += 1
-                    self.metrics["farm_food_total"] += farm_yield
-                if bonus > 0:
-                    self.metrics["granary_food_total"] = self.metrics.get("granary_food_total", 0) + bonus
-            if has_mine:
-                stone_add = mine_stone + (workshop_mine_bonus if has_workshop else 0.0)
-                s["stone_stock"] = float(s.get("stone_stock", 0)) + stone_add
-                self.metrics["mine_stone_total"] = self.metrics.get("mine_stone_total", 0) + stone_add
-            if has_workshop or has_foundry:
-                tools_add = 0.0
-                if has_workshop:
-                    tools_add += workshop_tools
-                    if "craft" in subjects:
-                        tools_add += float(SETTLEMENT_RULES.get("craft_tools_bonus", 0.1))
-                if has_foundry:
-                    tools_add += float(SETTLEMENT_RULES.get("foundry_tools_bonus", 0.15))
-                s["tools_stock"] = float(s.get("tools_stock", 0.0)) + tools_add
-                self.metrics["workshop_tools_total"] = self.metrics.get("workshop_tools_total", 0) + tools_add
-
-            soldiers_now = float(s.get("soldiers", 0.0))
-            pop_for_cap = max(1, pop_before)
-            soft_cap = pop_for_cap * float(SETTLEMENT_RULES.get("soldier_soft_cap_per_pop", 3.0))
-            if has_command:
-                soft_cap *= 1.25
+            pop_before = s.population
+            starve_before = s.starve_ticks
+            stock_at_start = float(s.food_stock)
+            prod = self.production(sid)
+            farm_yield = prod.farm_yield
+            if farm_yield > 0:
+                s.food_stock = stock_at_start + farm_yield
+                metrics["farm_harvest_events"] += 1
+                metrics["farm_food_total"] += farm_yield
+
+            soldiers_now = s.soldiers
+            soft_cap = max(1, pop_before) * self.rules.soldier_soft_cap_per_pop * prod.cap_scale
             recruit_scale = 1.0
             if soldiers_now >= soft_cap:
                 recruit_scale = 0.15
             elif soldiers_now >= soft_cap * 0.7:
                 recruit_scale = 0.4
-
-            if has_barracks:
-                barracks_soldiers = float(SETTLEMENT_RULES.get("barracks_soldiers_per_tick", 0.15)) * recruit_scale
-                s["soldiers"] = soldiers_now + barracks_soldiers
-                soldiers_now = float(s["soldiers"])
-                self.metrics["barracks_soldiers_total"] = self.metrics.get("barracks_soldiers_total", 0) + barracks_soldiers
-            if has_command:
-                cmd_soldiers = float(SETTLEMENT_RULES.get("command_soldiers_per_tick", 0.10)) * recruit_scale
-                s["soldiers"] = soldiers_now + cmd_soldiers
-                soldiers_now = float(s["soldiers"])
-                self.metrics["command_soldiers_total"] = self.metrics.get("command_soldiers_total", 0) + cmd_soldiers
-
-            if has_market:
-                mw = float(SETTLEMENT_RULES.get("market_wood_per_tick", 0.5))
-                ms = float(SETTLEMENT_RULES.get("market_stone_per_tick", 0.25))
-                s["wood_stock"] = float(s.get("wood_stock", 0) or 0) + mw
-                s["stone_stock"] = float(s.get("stone_stock", 0) or 0) + ms
-                self.metrics["market_wood_total"] = self.metrics.get("market_wood_total", 0) + mw
-                self.metrics["market_stone_total"] = self.metrics.get("market_stone_total", 0) + ms
-            if has_temple:
-                tf = float(SETTLEMENT_RULES.get("temple_food_per_tick", 0.35))
-                s["food_stock"] = float(s.get("food_stock", 0) or 0) + tf
-                self.metrics["temple_food_total"] = self.metrics.get("temple_food_total", 0) + tf
-            if has_hall:
-                hf = float(SETTLEMENT_RULES.get("hall_food_per_tick", 0.20))
-                s["food_stock"] = float(s.get("food_stock", 0) or 0) + hf
-                self.metrics["hall_food_total"] = self.metrics.get("hall_food_total", 0) + hf
-
-            k_add = 0.0
-            if has_academy:
-                k_add += float(SETTLEMENT_RULES.get("academy_knowledge_per_tick", 0.3))
-            if has_library:
-                k_add += float(SETTLEMENT_RULES.get("library_knowledge_per_tick", 0.2))
-            if has_lab:
-                k_add += float(SETTLEMENT_RULES.get("lab_knowledge_per_tick", 0.40))
-            if has_observatory:
-                k_add += float(SETTLEMENT_RULES.get("observatory_knowledge_per_tick", 0.50))
-            if k_add > 0:
-                s["knowledge"] = float(s.get("knowledge", 0.0)) + k_add
-                self.metrics["academy_knowledge_total"] = self.metrics.get("academy_knowledge_total", 0) + k_add
-                if has_academy:
+            for stock, metric, amount, recruit in prod.income:
+                if recruit:
+                    amount = amount * recruit_scale
+                setattr(s, stock, getattr(s, stock) + amount)
+                metrics[metric] = metrics.get(metric, 0) + amount
+            if prod.learns:
+                if prod.unlocks:
                     self._try_unlock_subjects(sid, s, tick)
-                if has_observatory:
+                if prod.discovers:
                     self._try_discovery(sid, s, tick)
 
-            post_harvest = float(s.get("food_stock", 0))
-            soldiers_now = float(s.get("soldiers", 0.0))
-            soldier_upkeep = soldiers_now * float(SETTLEMENT_RULES.get("soldier_food_consume", 0.03))
+            post_harvest = s.food_stock
+            soldiers_now = s.soldiers
+            soldier_upkeep = soldiers_now * self.rules.soldier_food_consume
             need = pop_before * cons + soldier_upkeep
-            starve_needed = granary_starve if has_granary else starve_needed_default
-            local_surplus_needed = int(SETTLEMENT_RULES.get("temple_surplus_ticks", 3)) if has_temple else surplus_needed
-            if "organisation" in subjects:
-                local_surplus_needed = max(1, local_surplus_needed - int(SETTLEMENT_RULES.get("organisation_surplus_reduction", 1)))
-            if has_hall:
-                local_surplus_needed = max(1, local_surplus_needed - 1)
-
-            if "surplus_ticks" not in s:
-                s["surplus_ticks"] = 0
-            if "starve_ticks" not in s:
-                s["starve_ticks"] = 0
+            starve_needed = prod.starve_needed
+            local_surplus_needed = prod.surplus_needed
 
             if pop_before <= 0:
-                s["starve_ticks"] = s["surplus_ticks"] = 0
+                s.starve_ticks = s.surplus_ticks = 0
             elif post_harvest >= need:
-                s["food_stock"] = post_harvest - need
-                s["starve_ticks"] = 0
-                if float(s["food_stock"]) >= (need + buffer_food):
-                    s["surplus_ticks"] = int(s.get("surplus_ticks", 0)) + 1
-                    if int(s["surplus_ticks"]) >= local_surplus_needed:
-                        s["population"] = pop_before + min(max_growth, 1)
-                        s["surplus_ticks"] = 0
+                s.food_stock = post_harvest - need
+                s.starve_ticks = 0
+                if s.food_stock >= (need + buffer_food):
+                    s.surplus_ticks += 1
+                    if s.surplus_ticks >= local_surplus_needed:
+                        s.population = pop_before + min(max_growth, 1)
+                        s.surplus_ticks = 0
                 else:
-                    s["surplus_ticks"] = 0
+                    s.surplus_ticks = 0
             else:
-                s["food_stock"] = 0.0
-                s["surplus_ticks"] = 0
-                s["starve_ticks"] = int(s.get("starve_ticks", 0)) + 1
-                if int(s["starve_ticks"]) >= starve_needed:
-                    soldiers = float(s.get("soldiers", 0.0))
-                    defend_cost = float(SETTLEMENT_RULES.get("soldier_defend_cost", 1.0))
-                    if "strategy" in subjects:
-                        defend_cost = max(0.5, defend_cost - float(SETTLEMENT_RULES.get("strategy_defend_bonus", 0.1)))
-                    if has_walls:
-                        defend_cost = max(0.4, defend_cost - float(SETTLEMENT_RULES.get("walls_defend_bonus", 0.25)))
+                s.food_stock = 0.0
+                s.surplus_ticks = 0
+                s.starve_ticks += 1
+                if s.starve_ticks >= starve_needed:
+                    soldiers = s.soldiers
+                    defend_cost = prod.defend_cost
                     if soldiers >= defend_cost:
-                        s["soldiers"] = soldiers - defend_cost
-                        s["starve_ticks"] = 0
+                        s.soldiers = soldiers - defend_cost
+                        s.starve_ticks = 0
                         self.metrics["soldier_defend_events"] = self.metrics.get("soldier_defend_events", 0) + 1
                         self.logger.event({
                             "type": "soldier_defend", "tick": tick, "settlement_id": sid,
-                            "soldiers_before": soldiers, "soldiers_after": s["soldiers"],
+                            "soldiers_before": soldiers, "soldiers_after": s.soldiers,
                             "pop_saved": pop_before,
                         })
                     else:
-                        s["population"] = max(0, pop_before - 1)
-                        s["starve_ticks"] = 0
+                        s.population = max(0, pop_before - 1)
+                        s.starve_ticks = 0
 
-            if pop_before <= 0 and float(s.get("food_stock", 0)) >= (buffer_food + cons * 3):
-                s["population"] = 1
-                s["starve_ticks"] = s["surplus_ticks"] = 0
+            if pop_before <= 0 and s.food_stock >= (buffer_food + cons * 3):
+                s.population = 1
+                s.starve_ticks = s.surplus_ticks = 0
 
-            pop_after = int(s.get("population", 0))
-            food_after = float(s.get("food_stock", 0))
+            if s.starve_ticks != starve_before:
+                self._state_version[sid] = self._state_version.get(sid, 0) + 1
+            pop_after = s.population
+            food_after = float(s.food_stock)
             if pop_after != pop_before:
                 self.metrics["population_net_change"] += pop_after - pop_before
                 if pop_after > pop_before:
                     self.metrics["population_grew_events"] += 1
                 else:
                     self.metrics["population_starved_events"] += 1
-            if pop_after != pop_before or food_after != stock_at_start:
-                self.logger.event({
-                    "type": "population_changed", "tick": tick, "settlement_id": sid,
-                    "population_before": pop_before, "population_after": pop_after,
-                    "food_before": stock_at_start, "food_after": food_after,
-                    "farm_yield": farm_yield, "granary_bonus": bonus, "need": need,
-                    "has_granary": has_granary, "has_mine": has_mine, "has_workshop": has_workshop,
-                    "has_barracks": has_barracks, "has_academy": has_academy, "has_walls": has_walls,
-                    "has_irrigation": has_irrigation, "has_library": has_library,
-                    "has_foundry": has_foundry, "has_hall": has_hall, "has_command": has_command,
-                    "has_lab": has_lab, "has_observatory": has_observatory,
-                    "subjects": subjects, "era": era,
-                })
+            if (pop_after != pop_before or food_after != stock_at_start) and self.logger.enabled("population_changed"):
+                self.logger.event_fields(
+                    "population_changed", tick, sid, pop_before, pop_after, stock_at_start, food_after,
+                    farm_yield, prod.granary_bonus, need, prod.flags_json, prod.subjects_json, prod.era,
+                )
 
         self._try_raids(world, tick)
         self._try_age_up(world, tick)
         self._try_age_up4(world, tick)
 
-    def _try_discovery(self, sid: str, s: Dict[str, Any], tick: int) -> None:
-        cost = float(SETTLEMENT_RULES.get("discovery_cost", 40))
-        max_d = int(SETTLEMENT_RULES.get("discovery_max", 8))
-        discoveries = int(s.get("discoveries", 0))
-        knowledge = float(s.get("knowledge", 0.0))
+    def _try_discovery(self, sid: str, s: SettlementRecord, tick: int) -> None:
+        cost = self.rules.discovery_cost
+        max_d = self.rules.discovery_max
+        discoveries = s.discoveries
+        knowledge = s.knowledge
         while discoveries < max_d and knowledge >= cost:
             discoveries += 1
             knowledge -= cost
-            s["discoveries"] = discoveries
-            s["knowledge"] = knowledge
+            s.discoveries = discoveries
+            s.knowledge = knowledge
+            self._touch(sid)
             self.metrics["discovery_events"] = self.metrics.get("discovery_events", 0) + 1
             self.logger.event({
                 "type": "discovery", "tick": tick, "settlement_id": sid,
@@ -486,24 +792,25 @@ class SettlementManager:
                 "knowledge_remaining": knowledge,
             })
 
-    def _try_unlock_subjects(self, sid: str, s: Dict[str, Any], tick: int) -> None:
-        subjects = list(s.get("subjects") or [])
-        knowledge = float(s.get("knowledge", 0.0))
+    def _try_unlock_subjects(self, sid: str, s: SettlementRecord, tick: int) -> None:
+        subjects = list(s.subjects)
+        knowledge = s.knowledge
         candidates = [
-            ("agriculture", float(SETTLEMENT_RULES.get("subject_agriculture_cost", 8))),
-            ("craft", float(SETTLEMENT_RULES.get("subject_craft_cost", 10))),
-            ("organisation", float(SETTLEMENT_RULES.get("subject_organisation_cost", 12))),
-            ("strategy", float(SETTLEMENT_RULES.get("subject_strategy_cost", 15))),
-            ("inquiry", float(SETTLEMENT_RULES.get("subject_inquiry_cost", 16))),
+            ("agriculture", self.rules.subject_agriculture_cost),
+            ("craft", self.rules.subject_craft_cost),
+            ("organisation", self.rules.subject_organisation_cost),
+            ("strategy", self.rules.subject_strategy_cost),
+            ("inquiry", self.rules.subject_inquiry_cost),
         ]
         for name, cost in candidates:
             if name in subjects:
                 continue
             if knowledge >= cost:
                 subjects.append(name)
-                s["subjects"] = subjects
-                s["knowledge"] = knowledge - cost
-                knowledge = float(s["knowledge"])
+                s.subjects = subjects
+                s.knowledge = knowledge - cost
+                self._note_progress(sid)
+                knowledge = s.knowledge
                 self.metrics["subject_unlock_events"] = self.metrics.get("subject_unlock_events", 0) + 1
                 self.logger.event({
                     "type": "subject_unlocked", "tick": tick, "settlement_id": sid,
@@ -512,68 +819,68 @@ class SettlementManager:
                 })
 
     def _try_raids(self, world, tick: int) -> None:
-        interval = int(SETTLEMENT_RULES.get("raid_interval", 25))
+        interval = self.rules.raid_interval
         if tick % interval != 0 or self.count() < 2:
             return
-        min_soldiers = float(SETTLEMENT_RULES.get("raid_min_soldiers", 3.0))
-        base_cost = float(SETTLEMENT_RULES.get("raid_cost", 2.0))
-        base_w = int(SETTLEMENT_RULES.get("raid_loot_wood", 4))
-        base_s = int(SETTLEMENT_RULES.get("raid_loot_stone", 3))
-        base_f = int(SETTLEMENT_RULES.get("raid_loot_food", 3))
-        scale = float(SETTLEMENT_RULES.get("raid_loot_scale", 8.0))
-        cap = int(SETTLEMENT_RULES.get("raid_loot_cap", 12))
+        min_soldiers = self.rules.raid_min_soldiers
+        base_cost = self.rules.raid_cost
+        base_w = self.rules.raid_loot_wood
+        base_s = self.rules.raid_loot_stone
+        base_f = self.rules.raid_loot_food
+        scale = self.rules.raid_loot_scale
+        cap = self.rules.raid_loot_cap
         all_s = list(self.settlements.items())
-        ranked = sorted(all_s, key=lambda x: float(x[1].get("soldiers", 0)), reverse=True)
+        ranked = sorted(all_s, key=lambda x: x[1].soldiers, reverse=True)
         atk_sid, atk = ranked[0]
-        atk_soldiers = float(atk.get("soldiers", 0))
+        atk_soldiers = atk.soldiers
         if atk_soldiers < min_soldiers:
             return
         others = [(sid, s) for sid, s in all_s if sid != atk_sid]
         if not others:
             return
-        tgt_sid, tgt = min(others, key=lambda x: float(x[1].get("soldiers", 0)))
+        tgt_sid, tgt = min(others, key=lambda x: x[1].soldiers)
         cost = base_cost
         has_walls = self.settlement_has_walls(tgt_sid, world)
         if has_walls:
-            cost += float(SETTLEMENT_RULES.get("walls_raid_extra_cost", 1.0))
+            cost += self.rules.walls_raid_extra_cost
         if atk_soldiers < cost:
             return
         extra = min(cap, int(atk_soldiers / scale))
         loot_w = base_w + extra
         loot_s = base_s + max(0, extra // 2)
         loot_f = base_f + max(0, extra // 2)
-        tgt_subjects = tgt.get("subjects") or []
-        has_strategy = "strategy" in tgt_subjects
+        has_strategy = "strategy" in tgt.subjects
         if has_strategy:
             loot_w = max(1, int(loot_w * 0.75))
             loot_s = max(1, int(loot_s * 0.75))
             loot_f = max(1, int(loot_f * 0.75))
-        take_w = min(loot_w, int(tgt.get("wood_stock", 0)))
-        take_s = min(loot_s, int(tgt.get("stone_stock", 0)))
-        take_f = min(loot_f, int(float(tgt.get("food_stock", 0))))
+        take_w = min(loot_w, int(tgt.wood_stock))
+        take_s = min(loot_s, int(tgt.stone_stock))
+        take_f = min(loot_f, int(tgt.food_stock))
         if take_w + take_s + take_f == 0:
             return
-        atk["soldiers"] = atk_soldiers - cost
-        tgt["wood_stock"] = int(tgt.get("wood_stock", 0)) - take_w
-        tgt["stone_stock"] = int(tgt.get("stone_stock", 0)) - take_s
-        tgt["food_stock"] = float(tgt.get("food_stock", 0)) - take_f
-        atk["wood_stock"] = int(atk.get("wood_stock", 0)) + take_w
-        atk["stone_stock"] = int(atk.get("stone_stock", 0)) + take_s
-        atk["food_stock"] = float(atk.get("food_stock", 0)) + take_f
-        def_loss = float(SETTLEMENT_RULES.get("raid_defender_loss", 1.5))
+        # raid loot truncates wood/stone stocks to whole units
+        atk.soldiers = atk_soldiers - cost
+        tgt.wood_stock = int(tgt.wood_stock) - take_w
+        tgt.stone_stock = int(tgt.stone_stock) - take_s
+        tgt.food_stock = float(tgt.food_stock) - take_f
+        atk.wood_stock = int(atk.wood_stock) + take_w
+        atk.stone_stock = int(atk.stone_stock) + take_s
+        atk.food_stock = float(atk.food_stock) + take_f
+        def_loss = self.rules.raid_defender_loss
         if has_walls:
-            def_loss = float(SETTLEMENT_RULES.get("raid_defender_loss_walls", 0.6))
+            def_loss = self.rules.raid_defender_loss_walls
         if has_strategy:
-            def_loss *= float(SETTLEMENT_RULES.get("raid_defender_loss_strategy", 0.75))
-        tgt_soldiers = float(tgt.get("soldiers", 0))
+            def_loss *= self.rules.raid_defender_loss_strategy
+        tgt_soldiers = tgt.soldiers
         actual_loss = min(def_loss, tgt_soldiers)
-        tgt["soldiers"] = tgt_soldiers - actual_loss
+        tgt.soldiers = tgt_soldiers - actual_loss
         self.metrics["raid_events"] = self.metrics.get("raid_events", 0) + 1
         self.metrics["raid_loot_total"] = self.metrics.get("raid_loot_total", 0) + take_w + take_s + take_f
         self.logger.event({
             "type": "raid", "tick": tick, "attacker": atk_sid, "target": tgt_sid,
             "cost_soldiers": cost, "loot": {"wood": take_w, "stone": take_s, "food": take_f},
-            "attacker_soldiers_after": atk["soldiers"],
+            "attacker_soldiers_after": atk.soldiers,
             "defender_soldier_loss": actual_loss,
             "target_had_walls": has_walls,
             "target_had_strategy": has_strategy,
@@ -581,48 +888,52 @@ class SettlementManager:
         })
 
     def _try_age_up(self, world, tick: int) -> None:
-        min_pop = int(SETTLEMENT_RULES.get("age_up_min_pop", 15))
-        food_bonus = float(SETTLEMENT_RULES.get("age_up_food_bonus", 5.0))
+        min_pop = self.rules.age_up_min_pop
+        food_bonus = self.rules.age_up_food_bonus
         for sid, s in self.settlements.items():
-            if int(s.get("era", 2)) >= 3:
+            if s.era >= 3:
                 continue
-            if int(s.get("population", 0)) < min_pop:
+            if s.population < min_pop:
                 continue
             # E5.10: workshop+barracks OR academy (science path can age independently)
             military = self.settlement_has_workshop(sid, world) and self.settlement_has_barracks(sid, world)
             science = self.settlement_has_academy(sid, world)
             if not (military or science):
                 continue
-            s["era"] = 3
-            s["food_stock"] = float(s.get("food_stock", 0)) + food_bonus
+            s.era = 3
+            self._note_progress(sid)
+            s.food_stock += food_bonus
             self.metrics["age_up_events"] = self.metrics.get("age_up_events", 0) + 1
             self.logger.event({
                 "type": "age_transition", "tick": tick, "settlement_id": sid,
-                "from_era": 2, "to_era": 3, "population": s.get("population"),
+                "from_era": 2, "to_era": 3, "population": s.population,
                 "food_bonus": food_bonus, "via": "military" if military else "science",
             })
 
     def _try_age_up4(self, world, tick: int) -> None:
-        min_pop = int(SETTLEMENT_RULES.get("age_up4_min_pop", 20))
-        food_bonus = float(SETTLEMENT_RULES.get("age_up4_food_bonus", 5.0))
+        min_pop = self.rules.age_up4_min_pop
+        food_bonus = self.rules.age_up4_food_bonus
         for sid, s in self.settlements.items():
-            if int(s.get("era", 2)) != 3:
+            if s.era != 3:
                 continue
-            if int(s.get("population", 0)) < min_pop:
+            if s.population < min_pop:
                 continue
-            if "inquiry" not in (s.get("subjects") or []):
+            if "inquiry" not in s.subjects:
                 continue
             if not self.settlement_has_academy(sid, world):
                 continue
-            s["era"] = 4
-            s["food_stock"] = float(s.get("food_stock", 0)) + food_bonus
+            s.era = 4
+            self._note_progress(sid)
+            s.food_stock += food_bonus
             self.metrics["age_up4_events"] = self.metrics.get("age_up4_events", 0) + 1
             self.logger.event({
                 "type": "age_transition", "tick": tick, "settlement_id": sid,
-                "from_era": 3, "to_era": 4, "population": s.get("population"),
+                "from_era": 3, "to_era": 4, "population": s.population,
                 "food_bonus": food_bonus,
             })
 
     def count_structures_of_type(self, sid, structure_type, world) -> int:
-        return sum(1 for stx in world.structures
-                   if stx.type == structure_type and self.structure_settlement_id(stx.x, stx.y) == sid)
+        code = BUILDING_CODES.get(structure_type)
+        if code is None:
+            return 0
+        return self.struct_counts.get(sid, _NO_STRUCTURES)[code]
@@ -0,0 +1,31 @@
+"""Uniform-cell spatial index for radius queries on the tile grid."""
+from typing import Dict, List, Tuple
+
+
+class CellIndex:
+    """Buckets integer ids by (x, y) into square cells.
+
+    Ids are expected to be added in increasing order (row numbers, creation
+    order); `within()` returns them sorted, so callers see the same order a
+    full scan would give.
+    """
+    __slots__ = ("cell", "_cells")
+
+    def __init__(self, cell: int = 8):
+        self.cell = cell
+        self._cells: Dict[Tuple[int, int], List[Tuple[int, int, int]]] = {}
+
+    def add(self, x: int, y: int, item: int) -> None:
+        self._cells.setdefault((x // self.cell, y // self.cell), []).append((x, y, item))
+
+    def within(self, x: int, y: int, radius: int) -> List[int]:
+        """Ids whose position is within Manhattan distance `radius` of (x, y)."""
+        c = self.cell
+        found = []
+        for cy in range((y - radius) // c, (y + radius) // c + 1):
+            for cx in range((x - radius) // c, (x + radius) // c + 1):
+                for px, py, item in self._cells.get((cx, cy), ()):
+                    if abs(px - x) + abs(py - y) <= radius:
+                        found.append(item)
+        found.sort()
+        return found
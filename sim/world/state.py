@@ -1,40 +1,389 @@
+from array import array
+from collections import Counter
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from types import MappingProxyType
+from typing import List, Dict, Any, Iterable, Iterator, Mapping, Optional, Tuple
+
+from sim.world.buildings import BUILDING_CODES, BUILDING_NAMES
+from sim.world.spatial import CellIndex
+
+
+RESOURCES = ("food", "wood", "stone")
+
+
+def _copy_array(a):
+    return array(a.typecode, a)
+
+
+class TileGrid:
+    """Struct-of-arrays tile storage: one contiguous int array per resource.
+
+    Always stdlib `array('q')`, even with NumPy installed: tiles are read and
+    written one cell at a time, where NumPy's scalar boxing is slower.
+    Indexing yields `Tile` views, so `tiles[i].food` still reads and writes.
+
+    `fork()` clones the grid copy-on-write: the resource arrays stay shared
+    until one side writes to them. All writes go through `Tile` setters or
+    `add_clamped()`, which call `_own()` first.
+    """
+    __slots__ = ("width", "height", "food", "wood", "stone", "_shared")
+
+    def __init__(self, width: int, height: int, food: Iterable[int], wood: Iterable[int], stone: Iterable[int]):
+        self.width = width
+        self.height = height
+        self.food = array("q", food)
+        self.wood = array("q", wood)
+        self.stone = array("q", stone)
+        self._shared: set = set()  # resources whose array may also belong to a fork
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # an unpickled grid always gets its own arrays
+        return {k: getattr(self, k) for k in self.__slots__ if k != "_shared"}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for k, v in state.items():
+            setattr(self, k, v)
+        self._shared = set()
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "TileGrid":
+        return self.fork()
+
+    def fork(self) -> "TileGrid":
+        """Copy-on-write clone of the grid."""
+        clone = TileGrid.__new__(TileGrid)
+        clone.width, clone.height = self.width, self.height
+        for r in RESOURCES:
+            setattr(clone, r, getattr(self, r))
+        self._shared = set(RESOURCES)
+        clone._shared = set(RESOURCES)
+        return clone
+
+    def _own(self, r: str) -> None:
+        """Make resource `r`'s array private before writing to it."""
+        setattr(self, r, _copy_array(getattr(self, r)))
+        self._shared.discard(r)
+
+    def __len__(self) -> int:
+        return len(self.food)
+
+    def __getitem__(self, i: int) -> "Tile":
+        if i < 0:
+            i += len(self.food)
+        return Tile(self, i)
+
+    def __iter__(self) -> Iterator["Tile"]:
+        for i in range(len(self.food)):
+            yield Tile(self, i)
+
+    def totals(self) -> Dict[str, int]:
+        return {r: sum(getattr(self, r)) for r in RESOURCES}
+
+    def add_clamped(self, indices: List[int], inc: Dict[str, int], caps: Dict[str, int]) -> None:
+        """Add `inc[r]` to resource r at every index (repeats stack), capped at `caps[r]`.
+
+        Same result as applying `min(v + inc, cap)` once per index in order,
+        since the increments are non-negative.
+        """
+        if not indices:
+            return
+        hits = Counter(indices)
+        for r, k in inc.items():
+            if not k:
+                continue
+            if r in self._shared:
+                self._own(r)
+            arr, cap = getattr(self, r), caps[r]
+            for i, n in hits.items():
+                v = arr[i] + k * n
+                arr[i] = v if v < cap else cap
 
 
-@dataclass
 class Tile:
-    food: int
-    wood: int
-    stone: int
+    """Thin read/write view of one cell in a `TileGrid`."""
+    __slots__ = ("_grid", "_i")
+
+    def __init__(self, grid: TileGrid, i: int):
+        self._grid = grid
+        self._i = i
+
+    @property
+    def food(self) -> int:
+        return int(self._grid.food[self._i])
+
+    @food.setter
+    def food(self, v: int) -> None:
+        g = self._grid
+        if "food" in g._shared:
+            g._own("food")
+        g.food[self._i] = v
+
+    @property
+    def wood(self) -> int:
+        return int(self._grid.wood[self._i])
+
+    @wood.setter
+    def wood(self, v: int) -> None:
+        g = self._grid
+        if "wood" in g._shared:
+            g._own("wood")
+        g.wood[self._i] = v
+
+    @property
+    def stone(self) -> int:
+        return int(self._grid.stone[self._i])
+
+    @stone.setter
+    def stone(self, v: int) -> None:
+        g = self._grid
+        if "stone" in g._shared:
+            g._own("stone")
+        g.stone[self._i] = v
 
     def to_dict(self) -> Dict[str, int]:
         return {"food": self.food, "wood": self.wood, "stone": self.stone}
 
+    def __repr__(self) -> str:
+        return f"Tile(food={self.food}, wood={self.wood}, stone={self.stone})"
+
+
+class AgentTable:
+    """Parallel stdlib `array('q')` columns for agent positions and inventories.
+
+    Rows are fixed at creation. Iterating or indexing yields one cached
+    `AgentState` accessor per row, in spawn order.
+    """
+    __slots__ = ("ids", "x", "y", "inv_food", "inv_wood", "inv_stone", "_views")
+
+    def __init__(self, ids: List[str], x: Iterable[int], y: Iterable[int],
+                 inv_food: Iterable[int], inv_wood: Iterable[int], inv_stone: Iterable[int]):
+        self.ids = list(ids)
+        self.x = array("q", x)
+        self.y = array("q", y)
+        self.inv_food = array("q", inv_food)
+        self.inv_wood = array("q", inv_wood)
+        self.inv_stone = array("q", inv_stone)
+        self._views = [AgentState(self, i) for i in range(len(self.ids))]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> "AgentState":
+        return self._views[i]
+
+    def __iter__(self) -> Iterator["AgentState"]:
+        return iter(self._views)
+
+    def set_inventory(self, food: int, wood: int, stone: int) -> None:
+        for arr, v in ((self.inv_food, food), (self.inv_wood, wood), (self.inv_stone, stone)):
+            arr[:] = array("q", [v] * len(arr))
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": aid, "x": x, "y": y, "inv": {"food": f, "wood": w, "stone": st}}
+            for aid, x, y, f, w, st in zip(self.ids, self.x.tolist(), self.y.tolist(), self.inv_food.tolist(),
+                                           self.inv_wood.tolist(), self.inv_stone.tolist())
+        ]
+
 
-@dataclass
 class AgentState:
-    agent_id: str
-    x: int
-    y: int
-    inv_food: int = 0
-    inv_wood: int = 0
-    inv_stone: int = 0
+    """Accessor for one row of an `AgentTable`."""
+    __slots__ = ("_t", "_i", "agent_id")
+
+    def __init__(self, table: AgentTable, i: int):
+        self._t = table
+        self._i = i
+        self.agent_id = table.ids[i]
+
+    @property
+    def x(self) -> int:
+        return int(self._t.x[self._i])
+
+    @x.setter
+    def x(self, v: int) -> None:
+        self._t.x[self._i] = v
+
+    @property
+    def y(self) -> int:
+        return int(self._t.y[self._i])
+
+    @y.setter
+    def y(self, v: int) -> None:
+        self._t.y[self._i] = v
+
+    @property
+    def inv_food(self) -> int:
+        return int(self._t.inv_food[self._i])
+
+    @inv_food.setter
+    def inv_food(self, v: int) -> None:
+        self._t.inv_food[self._i] = v
+
+    @property
+    def inv_wood(self) -> int:
+        return int(self._t.inv_wood[self._i])
+
+    @inv_wood.setter
+    def inv_wood(self, v: int) -> None:
+        self._t.inv_wood[self._i] = v
+
+    @property
+    def inv_stone(self) -> int:
+        return int(self._t.inv_stone[self._i])
+
+    @inv_stone.setter
+    def inv_stone(self, v: int) -> None:
+        self._t.inv_stone[self._i] = v
 
     def inv_dict(self) -> Dict[str, int]:
         return {"food": self.inv_food, "wood": self.inv_wood, "stone": self.inv_stone}
 
+    def __repr__(self) -> str:
+        return (f"AgentState(agent_id={self.agent_id!r}, x={self.x}, y={self.y}, "
+                f"inv_food={self.inv_food}, inv_wood={self.inv_wood}, inv_stone={self.inv_stone})")
+
+
+class StructureTable:
+    """Columnar structure storage: x, y, building code, owner and settlement id per row.
+
+    Rows are append-only. Iterating or indexing yields one cached `Structure`
+    accessor per row, in build order. `revision` is bumped whenever a row's
+    observable fields (type, position, owner) change.
+    """
+    __slots__ = ("x", "y", "code", "owner", "settlement_id", "_views", "_at",
+                 "revision", "_snap", "_snap_rev", "_rows", "_index")
+
+    def __init__(self):
+        self.x = array("l")
+        self.y = array("l")
+        self.code = array("B")
+        self.owner: List[str] = []
+        self.settlement_id: List[Optional[str]] = []
+        self._views: List[Structure] = []
+        self._at: Dict[Tuple[int, int], Structure] = {}  # first structure on each tile
+        self.revision = 0
+        self._snap: Tuple[Mapping[str, Any], ...] = ()
+        self._snap_rev = 0
+        self._rows: List[Optional[Mapping[str, Any]]] = []  # read-only row dicts, None = stale
+        self._index = CellIndex()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the read-only row caches are rebuilt on demand after unpickling
+        return {k: getattr(self, k) for k in self.__slots__ if k not in ("_snap", "_rows")}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for k, v in state.items():
+            setattr(self, k, v)
+        self._snap = ()
+        self._snap_rev = -1
+        self._rows = [None] * len(self._views)
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def __getitem__(self, i: int) -> "Structure":
+        return self._views[i]
+
+    def __iter__(self) -> Iterator["Structure"]:
+        return iter(self._views)
+
+    def add(self, type: str, x: int, y: int, owner_id: str) -> "Structure":
+        i = len(self._views)
+        self.x.append(x)
+        self.y.append(y)
+        self.code.append(BUILDING_CODES[type])
+        self.owner.append(owner_id)
+        self.settlement_id.append(None)
+        st = Structure(self, i)
+        self._views.append(st)
+        self._at.setdefault((x, y), st)
+        self._rows.append(None)
+        self._index.add(x, y, i)
+        self.revision += 1
+        return st
+
+    def _changed(self, i: int) -> None:
+        self._rows[i] = None
+        self.revision += 1
+
+    def _row(self, i: int) -> Mapping[str, Any]:
+        row = self._rows[i]
+        if row is None:
+            row = self._rows[i] = MappingProxyType(self._views[i].to_dict())
+        return row
+
+    def at(self, x: int, y: int) -> Optional["Structure"]:
+        return self._at.get((x, y))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [
+            {"type": BUILDING_NAMES[c], "x": x, "y": y, "owner": o}
+            for c, x, y, o in zip(self.code, self.x, self.y, self.owner)
+        ]
+
+    def snapshot(self) -> Tuple[Mapping[str, Any], ...]:
+        """Read-only `to_dicts()`, reused until the next revision."""
+        if self._snap_rev != self.revision:
+            self._snap = tuple(self._row(i) for i in range(len(self._views)))
+            self._snap_rev = self.revision
+        return self._snap
+
+    def near(self, x: int, y: int, radius: int) -> Tuple[Mapping[str, Any], ...]:
+        """Read-only rows within Manhattan distance `radius` of (x, y), in build order."""
+        return tuple(self._row(i) for i in self._index.within(x, y, radius))
+
 
-@dataclass
 class Structure:
-    type: str        # "hut" | "storage" | "farm"
-    x: int
-    y: int
-    owner_id: str
+    """Accessor for one row of a `StructureTable`. `type` is the building name."""
+    __slots__ = ("_t", "_i")
+
+    def __init__(self, table: StructureTable, i: int):
+        self._t = table
+        self._i = i
+
+    @property
+    def x(self) -> int:
+        return self._t.x[self._i]
+
+    @property
+    def y(self) -> int:
+        return self._t.y[self._i]
+
+    @property
+    def code(self) -> int:
+        return self._t.code[self._i]
+
+    @property
+    def type(self) -> str:
+        return BUILDING_NAMES[self._t.code[self._i]]
+
+    @type.setter
+    def type(self, name: str) -> None:
+        self._t.code[self._i] = BUILDING_CODES[name]
+        self._t._changed(self._i)
+
+    @property
+    def owner_id(self) -> str:
+        return self._t.owner[self._i]
+
+    @owner_id.setter
+    def owner_id(self, v: str) -> None:
+        self._t.owner[self._i] = v
+        self._t._changed(self._i)
+
+    @property
+    def settlement_id(self) -> Optional[str]:
+        return self._t.settlement_id[self._i]
+
+    @settlement_id.setter
+    def settlement_id(self, v: Optional[str]) -> None:
+        self._t.settlement_id[self._i] = v
 
     def to_dict(self) -> Dict[str, Any]:
         return {"type": self.type, "x": self.x, "y": self.y, "owner": self.owner_id}
 
+    def __repr__(self) -> str:
+        return f"Structure(type={self.type!r}, x={self.x}, y={self.y}, owner_id={self.owner_id!r})"
+
 
 @dataclass
 class Settlement:
@@ -61,34 +410,32 @@ class WorldState:
     tick: int
     width: int
     height: int
-    tiles: List[Tile]
-    agents: List[AgentState]
-    structures: List[Structure]
+    tiles: TileGrid
+    agents: AgentTable
+    structures: StructureTable
     settlements: List[Settlement]  # kept for compatibility; simloop also outputs settlements
 
     def idx(self, x: int, y: int) -> int:
         return y * self.width + x
 
     def tile_at(self, x: int, y: int) -> Tile:
-        return self.tiles[self.idx(x, y)]
+        return Tile(self.tiles, y * self.width + x)
 
     def structure_at(self, x: int, y: int) -> Optional[Structure]:
-        for s in self.structures:
-            if s.x == x and s.y == y:
-                return s
-        return None
+        return self.structures.at(x, y)
+
+    def add_structure(self, type: str, x: int, y: int, owner_id: str) -> Structure:
+        return self.structures.add(type, x, y, owner_id)
 
     def to_dict_summary(self) -> Dict[str, Any]:
-        total_food = sum(t.food for t in self.tiles)
-        total_wood = sum(t.wood for t in self.tiles)
-        total_stone = sum(t.stone for t in self.tiles)
+        totals = self.tiles.totals()
 
         return {
             "tick": self.tick,
             "width": self.width,
             "height": self.height,
-            "agents": [{"id": a.agent_id, "x": a.x, "y": a.y, "inv": a.inv_dict()} for a in self.agents],
-            "structures": [s.to_dict() for s in self.structures],
+            "agents": self.agents.summary(),
+            "structures": self.structures.to_dicts(),
             "settlements": [s.to_dict() for s in self.settlements],
-            "totals": {"food": total_food, "wood": total_wood, "stone": total_stone},
+            "totals": totals,
         }
\ No newline at end of file
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Convert a run's event log between events.jsonl and the binary events.bin.
+
+Usage:
+  python tools/convert_events.py runs/<run_id>/events.jsonl            # -> events.bin
+  python tools/convert_events.py runs/<run_id>/events.bin              # -> events.jsonl
+  python tools/convert_events.py runs/<run_id>/events.bin -o out.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sim.log.binlog import MAGIC, binary_to_jsonl, jsonl_to_binary
+
+
+def main():
+    p = argparse.ArgumentParser(description="Convert AI-world event logs between JSONL and binary")
+    p.add_argument("src", type=Path, help="events.jsonl or events.bin")
+    p.add_argument("-o", "--out", type=Path, default=None,
+                   help="Output file (default: next to src with the other extension)")
+    args = p.parse_args()
+
+    with args.src.open("rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    out = args.out or args.src.with_suffix(".jsonl" if binary else ".bin")
+    if out.resolve() == args.src.resolve():
+        p.error("output would overwrite the input")
+    n = binary_to_jsonl(args.src, out) if binary else jsonl_to_binary(args.src, out)
+    print(f"{n} events: {args.src} ({args.src.stat().st_size} bytes) -> {out} ({out.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
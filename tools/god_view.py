@@ -13,10 +13,16 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import sys
 import time
 from collections import Counter
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sim.log.binlog import read_binary_events, read_events, read_snapshots
+from sim.log.sinks import MANIFEST_NAME
+
 
 ICON = {
     "agent": "A", "hut": "H", "storage": "S", "farm": "F", "granary": "G",
@@ -44,6 +50,8 @@ def find_latest_run(runs_dir: Path) -> str | None:
 
 
 def load_snapshots(run_dir: Path) -> list[dict]:
+    if (run_dir / MANIFEST_NAME).exists():
+        return list(read_snapshots(run_dir))
     path = run_dir / "snapshots.jsonl"
     if not path.exists():
         print(f"No snapshots.jsonl in {run_dir}")
@@ -64,28 +72,38 @@ def load_summary(run_dir: Path) -> dict | None:
     return json.loads(path.read_text(encoding="utf-8"))
 
 
-def load_key_events(run_dir: Path) -> list[dict]:
+def _iter_events(run_dir: Path):
+    if (run_dir / MANIFEST_NAME).exists():
+        yield from read_events(run_dir)
+        return
+    if (run_dir / "events.bin").exists():
+        yield from read_binary_events(run_dir / "events.bin")
+        return
     path = run_dir / "events.jsonl"
     if not path.exists():
-        return []
-    out = []
+        return
     with path.open(encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
             try:
-                ev = json.loads(line)
+                yield json.loads(line)
             except json.JSONDecodeError:
                 continue
-            t = ev.get("type", "")
-            if t in KEY_EVENT_TYPES:
+
+
+def load_key_events(run_dir: Path) -> list[dict]:
+    out = []
+    for ev in _iter_events(run_dir):
+        t = ev.get("type", "")
+        if t in KEY_EVENT_TYPES:
+            out.append(ev)
+        elif t == "action_resolved" and str(ev.get("note", "")).startswith("built_"):
+            b = str(ev.get("note", "")).replace("built_", "")
+            if b in ("academy", "walls", "irrigation", "library", "foundry",
+                     "hall", "command", "lab", "observatory", "temple", "barracks", "workshop"):
                 out.append(ev)
-            elif t == "action_resolved" and str(ev.get("note", "")).startswith("built_"):
-                b = str(ev.get("note", "")).replace("built_", "")
-                if b in ("academy", "walls", "irrigation", "library", "foundry",
-                         "hall", "command", "lab", "observatory", "temple", "barracks", "workshop"):
-                    out.append(ev)
     return out
 
 
@@ -4,7 +4,6 @@
 from __future__ import annotations
 
 import argparse
-import json
 import sys
 from pathlib import Path
 
@@ -15,42 +14,28 @@ from sim.core.simloop import run_sim
 DEFAULT_SEEDS = [42, 1, 7, 100, 999, 2026]
 
 
-def load_summary(run_id: str) -> dict | None:
-    path = Path("runs") / run_id / "summary.json"
-    if not path.exists():
-        return None
-    return json.loads(path.read_text(encoding="utf-8"))
-
-
 def main():
     p = argparse.ArgumentParser(description="AI-world multi-seed validation")
     p.add_argument("--seeds", type=int, nargs="+", default=DEFAULT_SEEDS)
     p.add_argument("--ticks", type=int, default=500)
     p.add_argument("--snapshot-every", type=int, default=50)
-    p.add_argument("--quiet", action="store_true", help="Reduce logging (recommended for long runs)")
     args = p.parse_args()
 
-    # Auto-quiet for long runs
-    quiet = args.quiet or args.ticks >= 2000
-
     results = []
     print()
     print("=" * 120)
-    print(f"  AI-WORLD MULTI-SEED VALIDATION  |  ticks={args.ticks}  quiet={quiet}")
+    print(f"  AI-WORLD MULTI-SEED VALIDATION  |  ticks={args.ticks}")
     print("=" * 120)
     print()
 
     for seed in args.seeds:
         print(f"→ Running seed {seed} ...", flush=True)
-        score, run_id = run_sim(
+        result = run_sim(
             seed=seed, ticks=args.ticks,
             snapshot_every=args.snapshot_every,
-            return_score=True, quiet=quiet,
+            headless=True,
         )
-        summary = load_summary(run_id)
-        if summary is None:
-            print(f"  ERROR: no summary for {run_id}")
-            continue
+        summary = result.summary
 
         m = summary.get("metrics", {})
         settlements = summary.get("final", {}).get("settlements", [])
@@ -64,7 +49,7 @@ def main():
                 all_subjects.add(sub)
 
         results.append({
-            "seed": seed, "run_id": run_id, "score": summary.get("score"),
+            "seed": seed, "score": summary.get("score"),
             "net_pop": m.get("population_net_change", 0),
             "starved": m.get("population_starved_events", 0),
             "max_era": max_era,
@@ -85,7 +70,7 @@ def main():
         })
         print(f"  done → score={summary.get('score')} era={max_era} "
               f"lib={m.get('build_library',0)} lab={m.get('build_lab',0)} "
-              f"obs={m.get('build_observatory',0)} rid={run_id}")
+              f"obs={m.get('build_observatory',0)}")
         print()
 
     print()
@@ -95,14 +80,14 @@ def main():
     print(f"{'Seed':>6}  {'Score':>6}  {'NetPop':>6}  {'Starve':>6}  "
           f"{'Era':>3}  {'A4':>3}  {'Lib':>3}  {'Lab':>3}  {'Obs':>3}  "
           f"{'Found':>5}  {'Hall':>4}  {'Cmd':>3}  {'Sold':>5}  "
-          f"{'Subj':>4}  {'Know':>5}  Run ID")
+          f"{'Subj':>4}  {'Know':>5}")
     print("-" * 120)
     for r in results:
         print(f"{r['seed']:>6}  {r['score']:>6}  {r['net_pop']:>6}  {r['starved']:>6}  "
               f"{r['max_era']:>3}  {r['age_up4']:>3}  {r['library']:>3}  {r['lab']:>3}  "
               f"{r['observatory']:>3}  "
               f"{r['foundry']:>5}  {r['hall']:>4}  {r['command']:>3}  {r['soldiers']:>5}  "
-              f"{r['subjects']:>4}  {r['knowledge']:>5}  {r['run_id']}")
+              f"{r['subjects']:>4}  {r['knowledge']:>5}")
     print("-" * 120)
     print()
 
@@ -31,13 +31,6 @@ MIN_SCORE = 80                  # Era 2 floor (was 30 in Era 1)
 MIN_FARMS = 1                   # at least one farm should appear
 
 
-def load_summary(run_id: str) -> dict | None:
-    path = Path("runs") / run_id / "summary.json"
-    if not path.exists():
-        return None
-    return json.loads(path.read_text(encoding="utf-8"))
-
-
 def evaluate(row: dict) -> list[str]:
     """Return list of failure reasons (empty = pass)."""
     fails = []
@@ -93,16 +86,16 @@ def main():
     for seed in seed_list:
         print(f"→ seed {seed} ...", end=" ", flush=True)
         try:
-            score, run_id = run_sim(
+            result = run_sim(
                 seed=seed,
                 ticks=args.ticks,
                 snapshot_every=args.snapshot_every,
-                return_score=True,
+                headless=True,
             )
         except Exception as e:
             print(f"CRASH: {e}")
             row = {
-                "seed": seed, "run_id": None, "score": 0, "net_pop": -999,
+                "seed": seed, "score": 0, "net_pop": -999,
                 "starved": 0, "huts": 0, "storage": 0, "farms": 0,
                 "granary": 0, "mine": 0, "road": 0, "workshop": 0, "barracks": 0,
                 "defend": 0, "raids": 0, "food_dep": 0, "settlements": 0,
@@ -112,24 +105,10 @@ def main():
             failures.append(row)
             continue
 
-        summary = load_summary(run_id)
-        if summary is None:
-            print("NO SUMMARY")
-            row = {
-                "seed": seed, "run_id": run_id, "score": 0, "net_pop": -999,
-                "starved": 0, "huts": 0, "storage": 0, "farms": 0,
-                "granary": 0, "mine": 0, "road": 0, "workshop": 0, "barracks": 0,
-                "defend": 0, "raids": 0, "food_dep": 0, "settlements": 0,
-                "fails": ["no summary.json"], "status": "FAIL",
-            }
-            results.append(row)
-            failures.append(row)
-            continue
-
+        summary = result.summary
         m = summary.get("metrics", {})
         row = {
             "seed": seed,
-            "run_id": run_id,
             "score": summary.get("score", 0),
             "net_pop": m.get("population_net_change", 0),
             "starved": m.get("population_starved_events", 0),
@@ -10,8 +10,13 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sim.log.binlog import read_events
+
 
 def find_latest_run(runs_dir: Path) -> str | None:
     if not runs_dir.exists():
@@ -24,17 +29,10 @@ def find_latest_run(runs_dir: Path) -> str | None:
 
 
 def load_events(run_dir: Path):
-    path = run_dir / "events.jsonl"
-    if not path.exists():
+    if not any((run_dir / name).exists() for name in ("events.jsonl", "events.bin", "manifest.json")):
         print(f"No events.jsonl in {run_dir}")
         return []
-    events = []
-    with path.open(encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                events.append(json.loads(line))
-    return events
+    return list(read_events(run_dir))
 
 
 def load_summary(run_dir: Path):